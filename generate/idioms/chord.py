@@ -1,10 +1,14 @@
-import collections
-
 from generate.idioms.score import Score
 
 class Chord(Score):
 	"""A grouping of scale degrees and corresponding pitches"""
 
+	# chords are shared by every piece in a key, so they are never modified
+	__slots__ = (
+		"chord_name", "chord_symbol", "scale_degrees", "bass_degree",
+		"pitches_to_degrees", "chord_pitches",
+	)
+
 	chord_members = {
 		"I": (0, 2, 4), "I6": (0, 2, 4), "V": (4, 6, 1), "V7": (4, 6, 1, 3), 
 		"V6":(4, 6, 1), "VII6": (6, 1, 3), "V65": (4, 6, 1, 3), 
@@ -34,7 +38,12 @@ class Chord(Score):
 		"V/III": {1: 1, 3: 1}, "V7/III": {1: 1, 3: 1}, "V6/III": {1: 1, 3: 1},
 		"V65/III": {1: 1, 3: 1}, "V43/III": {1: 1, 3: 1}, "VII6/III": {1: 1, 3: 1},
 	}
-	all_pitches_to_degrees = collections.defaultdict(dict)
+	# (tonic pitch, mode): {chord name: (pitch-to-degree array, chord pitches)}
+	pitch_tables = {}
+	# (tonic pitch, mode, chord symbol): chord
+	chord_objs = {}
+	# marks pitches outside of a chord in its pitch-to-degree array
+	no_degree = 0xFF
 	bass_degrees = {
 		"I": 0, "I6": 2, "V": 4, "V7": 4, "V6": 6, "VII6": 1, "V65": 6,
 		"V43": 1, "V42": 3, "II": 1, "II6": 3, "IV": 3, "IV_MAJOR": 3, 
@@ -46,42 +55,64 @@ class Chord(Score):
 		"VII6_MAJOR": 1
 	}
 
-	def __init__(self, chord_symbol):
-		self.chord_name = chord_symbol[1:] 
-		self.chord_symbol = chord_symbol
-		self.scale_degrees = self.chord_members[self.chord_name]
-		self.bass_degree = self.bass_degrees[self.chord_name]
+	def __new__(cls, chord_symbol, tonic, mode):
+		# equal chords are the same object, so they compare by identity
+		chord_key = (cls.tonics[tonic], mode, chord_symbol)
+		chord_obj = cls.chord_objs.get(chord_key)
+		if chord_obj is not None:
+			return chord_obj
 
-		if self.chord_name not in self.all_pitches_to_degrees:
-			current_pitch = -12
-			root_pitch = current_pitch + self.tonics[self.tonic]
-			scale_sequence = self.mode_notes[self.mode]
+		chord_obj = super().__new__(cls)
+		chord_obj.chord_name = chord_symbol[1:]
+		chord_obj.chord_symbol = chord_symbol
+		chord_obj.scale_degrees = cls.chord_members[chord_obj.chord_name]
+		chord_obj.bass_degree = cls.bass_degrees[chord_obj.chord_name]
 
-			if self.mode == "ionian" and self.chord_name in self.major_mode_alterations:
-				note_alterations = self.major_mode_alterations[self.chord_name]
-			elif self.mode == "aeolian" and self.chord_name in self.minor_mode_alterations:
-				note_alterations = self.minor_mode_alterations[self.chord_name]
-			else:
-				note_alterations = {}	
+		pitch_tables = cls.get_pitch_tables(chord_key[0], mode)
+		chord_obj.pitches_to_degrees, chord_obj.chord_pitches = (
+			pitch_tables[chord_obj.chord_name]
+		)
+		cls.chord_objs[chord_key] = chord_obj
+		return chord_obj
 
-			while root_pitch < 128:
-				for scale_degree in self.scale_degrees:
-					note_shift = note_alterations.get(scale_degree, 0)
-					chromatic_shift = scale_sequence[scale_degree] + note_shift
-					current_pitch = root_pitch + chromatic_shift
-					if 0 <= current_pitch <= 127:
-						self.all_pitches_to_degrees[self.chord_name][current_pitch] = scale_degree
-				root_pitch += 12
+	def __repr__(self):
+		return self.chord_symbol
 
-		self.pitches_to_degrees = self.all_pitches_to_degrees[self.chord_name]
+	@classmethod
+	def get_pitch_tables(cls, tonic_pitch, mode):
+		"""Map midi pitches to scale degrees for every chord of a key"""
+		if (tonic_pitch, mode) not in cls.pitch_tables:
+			if mode == "ionian":
+				chord_alterations = cls.major_mode_alterations
+			elif mode == "aeolian":
+				chord_alterations = cls.minor_mode_alterations
+			else:
+				chord_alterations = {}
+			scale_sequence = cls.mode_notes[mode]
 
-	def __eq__(self, other):
-		return self.chord_symbol == other.chord_symbol
+			key_pitch_tables = {}
+			for chord_name, scale_degrees in cls.chord_members.items():
+				note_alterations = chord_alterations.get(chord_name, {})
+				pitches_to_degrees = bytearray((cls.no_degree,)) * 128
+				# pitches are listed octave by octave, in chord member order
+				chord_pitches = []
+				for root_pitch in range(tonic_pitch - 12, 128, 12):
+					for scale_degree in scale_degrees:
+						note_shift = note_alterations.get(scale_degree, 0)
+						current_pitch = root_pitch + scale_sequence[scale_degree] + note_shift
+						if 0 <= current_pitch <= 127:
+							pitches_to_degrees[current_pitch] = scale_degree
+							chord_pitches.append(current_pitch)
+				key_pitch_tables[chord_name] = (
+					bytes(pitches_to_degrees), bytes(chord_pitches)
+				)
+			cls.pitch_tables[(tonic_pitch, mode)] = key_pitch_tables
 
-	def __repr__(self):
-		return self.chord_symbol
+		return cls.pitch_tables[(tonic_pitch, mode)]
 
 	@classmethod
-	def reset_settings(cls):
-		"""Removes all pitch-to-scale degree assignments"""
-		cls.all_pitches_to_degrees = collections.defaultdict(dict)
+	def make_pitch_tables(cls):
+		"""Precompute the chord pitches of every key"""
+		for tonic_pitch in range(12):
+			for mode in cls.mode_notes:
+				cls.get_pitch_tables(tonic_pitch, mode)
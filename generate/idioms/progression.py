@@ -598,6 +598,10 @@ class Progression(Score):
 			PATTERN_EXTEND5_DOUBLE28, PATTERN_EXTEND5_DOUBLE29, 
 			PATTERN_EXTEND5_DOUBLE30, PATTERN_EXTEND5_DOUBLE31
 		)
+		self.start_period()
+
+	def start_period(self):
+		"""Begin the chord progression of a new period"""
 		# starting chord is based on reverse membership testing of I and I6
 		# previous chord is used on first index so it needs placeholder value
 		self.previous_chord = "None"
@@ -1,20 +1,35 @@
 from fractions import Fraction
 import logging
+import os
 import random
 
 class Score:
 	"""Overarching model of a musical piece"""
-	
+
+	# lets subclasses such as Chord do without an instance dict
+	__slots__ = ()
+
 	mode = None
 	tonic = None
 	style = None
 	repeat_ending = None
+	# None keeps the parameter logs out of the filesystem
+	log_dir = "logs"
 
 	# exclude 9/8 because of uneven divisions
 	# 2/4, 3/4, 6/8, 4/4, 12/8
 	# the difference between duple and quadruple meter is semantic
 	time_sigs = ((2, 2), (3, 2), (2, 3), (4, 2), (3, 2), (4, 3))
 	time_sig = None
+	# each letter is a period of 16 chords, repeated letters repeat a period
+	forms = {
+		"period": "A", "binary": "AB", "ternary": "ABA", "song": "AABA",
+		"rondo": "ABACA",
+	}
+	form = None
+	period_length = 16
+	# a period is an antecedent phrase answered by a consequent phrase
+	phrase_length = 8
 	simple_beat_durations = {
 		4: "1", 3: "2.", 2: "2", 1.5: "4.", 1: "4", 0.75: "8.",
 		0.5: "8", 0.375: "16.", 0.25: "16", 0.125: "32", 
@@ -32,23 +47,23 @@ class Score:
 	# 1 = rhythm2 etc.
 	# -1 = sustain
 	# -2 = pickup
-	# duplicate patterns are used to alter selected pattern probability
+	# (pattern, weight) options of each phrase
+	# weights alter selected pattern probability
 	rhythm_patterns = (
-		((0, 0, 0, -1), (0, 0, 1, -1), (0, 1, 0, -1)), 
+		(((0, 0, 0, -1), 1), ((0, 0, 1, -1), 1), ((0, 1, 0, -1), 1)),
 		(
-			(0, 0, 0, -1), (0, 0, 1, -1), (0, 1, 0, -1), (0, 0 , 2, -1), 
-			(0, 2, 0, -1), (0, 1, 2, -1), (0, 2, 1, -1), (0, 0, -1, -1), 
-			(0, 1, -1, -1), (0, 2, -1, -1), (0, 0, -1, -1), (0, 1, -1, -1), 
-			(0, 2, -1, -1), (0, 0, -1, -1), (0, 1, -1, -1), (0, 2, -1, -1),
-			(0, 0, -1, -2), (0, 1, -1, -2), (0, 2, -1, -2), (0, 0, -1, -2), 
-			(0, 1, -1, -2), (0, 2, -1, -2), (0, 0, -1, -2), (0, 1, -1, -2), 
-			(0, 2, -1, -2), (0, 0, -1, -2), (0, 1, -1, -2), (0, 2, -1, -2),
+			((0, 0, 0, -1), 1), ((0, 0, 1, -1), 1), ((0, 1, 0, -1), 1),
+			((0, 0, 2, -1), 1), ((0, 2, 0, -1), 1), ((0, 1, 2, -1), 1),
+			((0, 2, 1, -1), 1), ((0, 0, -1, -1), 3), ((0, 1, -1, -1), 3),
+			((0, 2, -1, -1), 3), ((0, 0, -1, -2), 4), ((0, 1, -1, -2), 4),
+			((0, 2, -1, -2), 4),
 		), (
-			(0, 0, 0, -1), (0, 0, 1, -1), (0, 1, 0, -1), (0, 0, 2, -1), 
-			(0, 2, 0, -1), (0, 0, 0, 1), (0, 0, 1, 0), (0, 1, 0, 0), 
-			(0, 0, 2, 0), (0, 2, 0, 0), (0, 1, 2, -1), (0, 1, 2, 0), 
-			(0, 2, 1, -1), (0, 2, 1, 0),
-		), ((0, 0, -1, -1), (0, 1, -1, -1), (0, 2, -1, -1))
+			((0, 0, 0, -1), 1), ((0, 0, 1, -1), 1), ((0, 1, 0, -1), 1),
+			((0, 0, 2, -1), 1), ((0, 2, 0, -1), 1), ((0, 0, 0, 1), 1),
+			((0, 0, 1, 0), 1), ((0, 1, 0, 0), 1), ((0, 0, 2, 0), 1),
+			((0, 2, 0, 0), 1), ((0, 1, 2, -1), 1), ((0, 1, 2, 0), 1),
+			((0, 2, 1, -1), 1), ((0, 2, 1, 0), 1),
+		), (((0, 0, -1, -1), 1), ((0, 1, -1, -1), 1), ((0, 2, -1, -1), 1))
 	)
 	tonics = {
 		"C": 0, "C#": 1, "Db": 1, "D": 2, "D#": 3, "Eb": 3, "E": 4,"F": 5, "F#": 6, 
@@ -78,8 +93,26 @@ class Score:
 	subdom_sevenths = {"II7", "II65", "II43", "II42"}
 
 	@classmethod
-	def reset(cls, tonic=None, mode=None, style=None):
+	def check_settings(
+	  cls, tonic=None, mode=None, style=None, time_sig=None, form=None):
+		"""Raise a ValueError for settings that reset would not accept"""
+		if mode is None:
+			if style not in ("Mm", "modal"):
+				raise ValueError("Invalid mode (style) input")
+		elif mode.lower() not in cls.mode_notes and mode.lower() not in ("major", "minor"):
+			raise ValueError("Invalid mode input")
+		if tonic is not None and tonic.title() not in cls.tonics:
+			raise ValueError("Invalid tonic note")
+		if time_sig is not None and time_sig not in cls.time_sigs:
+			raise ValueError("Invalid time signature")
+		if (form is not None and form not in cls.forms and 
+		  not (form.isalpha() and form.isupper())):
+			raise ValueError("Invalid form input")
+
+	@classmethod
+	def reset(cls, tonic=None, mode=None, style=None, time_sig=None, form=None):
 		"""Reset the variables of the Score class"""
+		cls.check_settings(tonic, mode, style, time_sig, form)
 		if mode is not None:
 			mode = mode.lower()
 		if tonic is not None:
@@ -90,31 +123,25 @@ class Score:
 			cls.mode = "ionian"
 		elif mode == "minor":
 			cls.mode = "aeolian"
-		elif mode is None: 
-			if style == "Mm":
-				cls.mode = random.choice(("ionian", "aeolian"))
-			elif style == "modal":
-				cls.mode = random.choice(
-					("lydian", "mixolydian", "dorian", "phrygian")
-				)
-			else:
-				raise ValueError("Invalid mode (style) input")
+		elif style == "Mm":
+			cls.mode = random.choice(("ionian", "aeolian"))
 		else:
-			raise ValueError("Invalid mode input")
+			cls.mode = random.choice(("lydian", "mixolydian", "dorian", "phrygian"))
 		cls.style = style
 
 		if tonic is None:
 			cls.tonic = cls.choose_key_sig()
-		elif tonic in cls.tonics:
-			cls.tonic = tonic
 		else:
-			raise ValueError("Invalid tonic note")
+			cls.tonic = tonic
 		# elif cls.mode == "aeolian":
 		# 	cls.key_sigs = (
 		# 		"A", "E", "B", "F#", "C#", "G#", "D#", "Bb", "F", "C", "G", "D",
 		# 	)
 
-		cls.time_sig = random.choice(cls.time_sigs)
+		if time_sig is None:
+			cls.time_sig = random.choice(cls.time_sigs)
+		else:
+			cls.time_sig = time_sig
 		cls.measure_length = cls.time_sig[0]
 		cls.beat_division = cls.time_sig[1]
 		if cls.beat_division == 2:
@@ -123,6 +150,13 @@ class Score:
 			cls.beat_durations = cls.compound_beat_durations
 		cls.repeat_ending = random.choice((True, False))
 
+		if form is None:
+			cls.form = cls.forms["period"]
+		elif form in cls.forms:
+			cls.form = cls.forms[form]
+		else:
+			cls.form = form
+
 	@classmethod
 	def choose_key_sig(cls):
 		"""Chooses a random key signature from those with a 
@@ -169,7 +203,19 @@ class Score:
 
 		logger_name = cls.__name__.lower()
 		cls.logger = logging.getLogger(logger_name)
-		log_handler = logging.FileHandler(f"logs/{logger_name}.log", mode='w')
+		# every new part replaces the handler of the previous one
+		for old_handler in cls.logger.handlers[:]:
+			cls.logger.removeHandler(old_handler)
+			old_handler.close()
+
+		if cls.log_dir is None:
+			cls.logger.addHandler(logging.NullHandler())
+			cls.logger.setLevel(logging.CRITICAL)
+			return
+		cls.logger.setLevel(logging.NOTSET)
+		log_handler = logging.FileHandler(
+			os.path.join(cls.log_dir, f"{logger_name}.log"), mode='w'
+		)
 		log_handler.setLevel(logging.WARNING)
 		log_format = logging.Formatter("%(name)s %(levelname)s %(message)s")
 		log_handler.setFormatter(log_format)
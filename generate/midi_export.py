@@ -10,7 +10,14 @@
 #              software is distributed.
 # -----------------------------------------------------------------------------
 
+from array import array
+import functools
+import heapq
+import itertools
 import math
+import mmap
+import operator
+import os
 import struct
 import warnings
 
@@ -30,7 +37,13 @@ MINOR = 1
 SHARPS = 1
 FLATS = -1
 
-__all__ = ['MIDIFile', 'MAJOR', 'MINOR', 'SHARPS', 'FLATS']
+__all__ = ['MIDIFile', 'MIDIStreamWriter', 'readMIDIFile', 'MAJOR', 'MINOR', 'SHARPS', 'FLATS']
+
+# Precompiled layouts of the fixed-size bytes that follow an event's delta time
+
+channelEventStruct = struct.Struct('>BBB')  # status, data1, data2
+shortChannelEventStruct = struct.Struct('>BB')  # status, data1
+metaEventStruct = struct.Struct('>BBB')  # 0xFF, subcode, length
 
 
 class GenericEvent(object):
@@ -39,11 +52,21 @@ class GenericEvent(object):
     '''
     evtname = None
     sec_sort_order = 0
+    # Attributes that, along with the event name and tick, make two events
+    # duplicates of each other
+    dedup_fields = ()
 
     def __init__(self, tick, insertion_order):
         self.tick = tick
         self.insertion_order = insertion_order
 
+    def dedup_key(self):
+        '''
+        Return the composite key that duplicate events have in common.
+        '''
+        return (self.evtname, self.tick) + tuple(
+            getattr(self, field) for field in self.dedup_fields)
+
     def __eq__(self, other):
         '''
         Equality operator.
@@ -53,10 +76,10 @@ class GenericEvent(object):
         therefore have an equality operator (__hash__() and __eq__() must both
         be defined).
 
-        Some derived classes will need to override and consider their specific
-        attributes in the comparison.
+        Derived classes list their specific attributes in ``dedup_fields``
+        to have them considered in the comparison.
         '''
-        return (self.evtname == other.evtname and self.tick == other.tick)
+        return self.dedup_key() == other.dedup_key()
 
     def __hash__(self):
         '''
@@ -64,21 +87,11 @@ class GenericEvent(object):
 
         This is needed in order to allow GenericObject classes to be used
         as the key in a dict or set. duplicate objects are removed from
-        the event list by storing all the objects in a set, and then
-        reconstructing the list from the set.  The only real requirement
-        for the algorithm is that the hash of equal objects must be equal.
-        There is probably great opportunity for improvements in the hashing
-        function.
-        '''
-        # Robert Jenkin's 32 bit hash.
-        a = int(self.tick)
-        a = (a + 0x7ed55d16) + (a << 12)
-        a = (a ^ 0xc761c23c) ^ (a >> 19)
-        a = (a + 0x165667b1) + (a << 5)
-        a = (a + 0xd3a2646c) ^ (a << 9)
-        a = (a + 0xfd7046c5) + (a << 3)
-        a = (a ^ 0xb55a4f09) ^ (a >> 16)
-        return a
+        the event list by storing all the objects in a dict. The hash covers
+        the whole composite key, so that the many events which share a tick
+        do not all collide into one bucket.
+        '''
+        return hash(self.dedup_key())
 
 
 class NoteOn(GenericEvent):
@@ -88,6 +101,7 @@ class NoteOn(GenericEvent):
     evtname = 'NoteOn'
     midi_status = 0x90    # 0x9x is Note On
     sec_sort_order = 3
+    dedup_fields = ('pitch', 'channel')
 
     def __init__(self, channel, pitch, tick, duration, volume,
                  annotation=None, insertion_order=0):
@@ -98,14 +112,6 @@ class NoteOn(GenericEvent):
         self.annotation = annotation
         super(NoteOn, self).__init__(tick, insertion_order)
 
-    def __eq__(self, other):
-        return (self.evtname == other.evtname and self.tick == other.tick and
-                self.pitch == other.pitch and self.channel == other.channel)
-
-    # In Python 3, a class which overrides __eq__ also needs to provide __hash__,
-    # because in Python 3 parent __hash__ is not inherited.
-    __hash__ = GenericEvent.__hash__
-
     def __str__(self):
         return 'NoteOn %d at tick %d duration %d ch %d vel %d' % (
             self.pitch, self.tick, self.duration, self.channel, self.volume)
@@ -114,15 +120,9 @@ class NoteOn(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.pitch)
-        midibytes += struct.pack('>B', self.volume)
-        return midibytes
+        return packEvent(self.tick - previous_event_tick, channelEventStruct,
+                         self.midi_status | self.channel, self.pitch,
+                         self.volume)
 
 
 class NoteOff (GenericEvent):
@@ -132,6 +132,7 @@ class NoteOff (GenericEvent):
     evtname = 'NoteOff'
     midi_status = 0x80  # 0x8x is Note Off
     sec_sort_order = 2  # must be less than that of NoteOn
+    dedup_fields = ('pitch', 'channel')
     # If two events happen at the same time, the secondary sort key is
     # ``sec_sort_order``. Thus a class of events can be processed earlier than
     # another. One place this is used in the code is to make sure that note
@@ -145,12 +146,6 @@ class NoteOff (GenericEvent):
         self.annotation = annotation
         super(NoteOff, self).__init__(tick, insertion_order)
 
-    def __eq__(self, other):
-        return (self.evtname == other.evtname and self.tick == other.tick and
-                self.pitch == other.pitch and self.channel == other.channel)
-
-    __hash__ = GenericEvent.__hash__
-
     def __str__(self):
         return 'NoteOff %d at tick %d ch %d vel %d' % (
             self.pitch, self.tick, self.channel, self.volume)
@@ -159,15 +154,9 @@ class NoteOff (GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.pitch)
-        midibytes += struct.pack('>B', self.volume)
-        return midibytes
+        return packEvent(self.tick - previous_event_tick, channelEventStruct,
+                         self.midi_status | self.channel, self.pitch,
+                         self.volume)
 
 
 class Tempo(GenericEvent):
@@ -176,18 +165,12 @@ class Tempo(GenericEvent):
     '''
     evtname = 'Tempo'
     sec_sort_order = 3
+    dedup_fields = ('tempo',)
 
     def __init__(self, tick, tempo, insertion_order=0):
         self.tempo = int(60000000 / tempo)
         super(Tempo, self).__init__(tick, insertion_order)
 
-    def __eq__(self, other):
-        return (self.evtname == other.evtname and
-                self.tick == other.tick and
-                self.tempo == other.tempo)
-
-    __hash__ = GenericEvent.__hash__
-
     def serialize(self, previous_event_tick):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
@@ -211,17 +194,13 @@ class Tempo(GenericEvent):
         # Six identical lower-case letters such as tttttt refer to a 24-bit value, stored
         # most-significant-byte first. The notation len refers to the
 
-        midibytes = b""
         code = 0xFF
         subcode = 0x51
         fourbite = struct.pack('>L', self.tempo)  # big-endian uint32
         threebite = fourbite[1:4]  # Just discard the MSB
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        midibytes += struct.pack('>B', 0x03)  # length in bytes of 24-bit tempo
+        # 0x03 is the length in bytes of the 24-bit tempo
+        midibytes = packEvent(self.tick - previous_event_tick, metaEventStruct,
+                              code, subcode, 0x03)
         midibytes += threebite
         return midibytes
 
@@ -250,18 +229,11 @@ class Copyright(GenericEvent):
         # File, all of the copyright notices should be placed together in this
         # event so that it will be at the beginning of the file. This event
         # should be the first event in the track chunk, at tick 0.
-        midibytes = b""
         code = 0xFF
         subcode = 0x02
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        payloadLength = len(self.notice)
-        payloadLengthVar = writeVarLength(payloadLength)
-        for i in payloadLengthVar:
-            midibytes += struct.pack("b", i)
+        midibytes = packEvent(self.tick - previous_event_tick,
+                              shortChannelEventStruct, code, subcode)
+        midibytes += writeVarLength(len(self.notice))
         midibytes += self.notice
         return midibytes
 
@@ -281,18 +253,11 @@ class Text(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
         code = 0xFF
         subcode = 0x01
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        payloadLength = len(self.text)
-        payloadLengthVar = writeVarLength(payloadLength)
-        for i in payloadLengthVar:
-            midibytes += struct.pack("B", i)
+        midibytes = packEvent(self.tick - previous_event_tick,
+                              shortChannelEventStruct, code, subcode)
+        midibytes += writeVarLength(len(self.text))
         midibytes += self.text
         return midibytes
 
@@ -315,18 +280,13 @@ class KeySignature(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
         code = 0xFF
         subcode = 0x59
         event_subtype = 0x02
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        midibytes += struct.pack('>B', event_subtype)
-        midibytes += struct.pack('>b', self.accidentals * self.accidental_type)
-        midibytes += struct.pack('>B', self.mode)
+        midibytes = packEvent(self.tick - previous_event_tick, metaEventStruct,
+                              code, subcode, event_subtype)
+        midibytes += struct.pack('>bB', self.accidentals * self.accidental_type,
+                                 self.mode)
         return midibytes
 
 
@@ -337,6 +297,7 @@ class ProgramChange(GenericEvent):
     evtname = 'ProgramChange'
     midi_status = 0xc0   # 0xcx is Program Change
     sec_sort_order = 1
+    dedup_fields = ('programNumber', 'channel')
 
     def __init__(self, channel, tick, programNumber,
                  insertion_order=0):
@@ -344,26 +305,13 @@ class ProgramChange(GenericEvent):
         self.channel = channel
         super(ProgramChange, self).__init__(tick, insertion_order)
 
-    def __eq__(self, other):
-        return (self.evtname == other.evtname and
-                self.tick == other.tick and
-                self.programNumber == other.programNumber and
-                self.channel == other.channel)
-
-    __hash__ = GenericEvent.__hash__
-
     def serialize(self, previous_event_tick):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.programNumber)
-        return midibytes
+        return packEvent(self.tick - previous_event_tick,
+                         shortChannelEventStruct,
+                         self.midi_status | self.channel, self.programNumber)
 
 
 class SysExEvent(GenericEvent):
@@ -387,20 +335,13 @@ class SysExEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
         code = 0xF0
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-
-        payloadLength = writeVarLength(len(self.payload) + 2)
-        for lenByte in payloadLength:
-            midibytes += struct.pack('>B', lenByte)
-
-        midibytes += struct.pack('>B', self.manID)
+        midibytes = bytearray(writeVarLength(self.tick - previous_event_tick))
+        midibytes.append(code)
+        midibytes += writeVarLength(len(self.payload) + 2)
+        midibytes.append(self.manID)
         midibytes += self.payload
-        midibytes += struct.pack('>B', 0xF7)
+        midibytes.append(0xF7)
         return midibytes
 
 
@@ -429,28 +370,22 @@ class UniversalSysExEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
         code = 0xF0
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
+        midibytes = bytearray(writeVarLength(self.tick - previous_event_tick))
+        midibytes.append(code)
 
         # Do we need to add a length?
-        payloadLength = writeVarLength(len(self.payload) + 5)
-        for lenByte in payloadLength:
-            midibytes += struct.pack('>B', lenByte)
+        midibytes += writeVarLength(len(self.payload) + 5)
 
         if self.realTime:
-            midibytes += struct.pack('>B', 0x7F)
+            midibytes.append(0x7F)
         else:
-            midibytes += struct.pack('>B', 0x7E)
+            midibytes.append(0x7E)
 
-        midibytes += struct.pack('>B', self.sysExChannel)
-        midibytes += struct.pack('>B', self.code)
-        midibytes += struct.pack('>B', self.subcode)
+        midibytes += struct.pack('>BBB', self.sysExChannel, self.code,
+                                 self.subcode)
         midibytes += self.payload
-        midibytes += struct.pack('>B', 0xF7)
+        midibytes.append(0xF7)
         return midibytes
 
 
@@ -478,15 +413,9 @@ class ControllerEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.controller_number)
-        midibytes += struct.pack('>B', self.parameter)
-        return midibytes
+        return packEvent(self.tick - previous_event_tick, channelEventStruct,
+                         self.midi_status | self.channel,
+                         self.controller_number, self.parameter)
 
 
 class ChannelPressureEvent(GenericEvent):
@@ -496,32 +425,20 @@ class ChannelPressureEvent(GenericEvent):
     evtname = 'ChannelPressure'
     midi_status = 0xD0  # 0xDx is Channel Pressure (Aftertouch)
     sec_sort_order = 1
+    dedup_fields = ('pressure_value', 'channel')
 
     def __init__(self, channel, tick, pressure_value, insertion_order=0):
         self.channel = channel
         self.pressure_value = pressure_value
         super(ChannelPressureEvent, self).__init__(tick, insertion_order)
 
-    def __eq__(self, other):
-        return (self.__class__.__name__ == other.__class__.__name__ and
-                self.tick == other.tick and
-                self.pressure_value == other.pressure_value and
-                self.channel == other.channel)
-
-    __hash__ = GenericEvent.__hash__
-
     def serialize(self, previous_event_tick):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        vartick = writeVarLength(self.tick - previous_event_tick)
-        for x in vartick:
-            midibytes += struct.pack('>B', x)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', self.pressure_value)
-        return midibytes
+        return packEvent(self.tick - previous_event_tick,
+                         shortChannelEventStruct,
+                         self.midi_status | self.channel, self.pressure_value)
 
 
 class PitchWheelEvent(GenericEvent):
@@ -546,17 +463,10 @@ class PitchWheelEvent(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        code = self.midi_status | self.channel
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes = midibytes + struct.pack('>B', timeByte)
         MSB = (self.pitch_wheel_value + 8192) >> 7
         LSB = (self.pitch_wheel_value + 8192) & 0x7F
-        midibytes = midibytes + struct.pack('>B', code)
-        midibytes = midibytes + struct.pack('>B', LSB)
-        midibytes = midibytes + struct.pack('>B', MSB)
-        return midibytes
+        return packEvent(self.tick - previous_event_tick, channelEventStruct,
+                         self.midi_status | self.channel, LSB, MSB)
 
 
 class TrackName(GenericEvent):
@@ -565,33 +475,20 @@ class TrackName(GenericEvent):
     '''
     evtname = 'TrackName'
     sec_sort_order = 0
+    dedup_fields = ('trackName',)
 
     def __init__(self, tick, trackName, insertion_order=0):
         # GenericEvent.__init__(self, tick)
         self.trackName = trackName.encode("ISO-8859-1")
         super(TrackName, self).__init__(tick, insertion_order)
 
-    def __eq__(self, other):
-        return (self.evtname == other.evtname and
-                self.tick == other.tick and
-                self.trackName == other.trackName)
-
-    __hash__ = GenericEvent.__hash__
-
     def serialize(self, previous_event_tick):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('B', 0xFF)
-        midibytes += struct.pack('B', 0X03)
-        dataLength = len(self.trackName)
-        dataLengthVar = writeVarLength(dataLength)
-        for i in dataLengthVar:
-            midibytes += struct.pack("B", i)
+        midibytes = packEvent(self.tick - previous_event_tick,
+                              shortChannelEventStruct, 0xFF, 0X03)
+        midibytes += writeVarLength(len(self.trackName))
         midibytes += self.trackName
         return midibytes
 
@@ -615,23 +512,24 @@ class TimeSignature(GenericEvent):
         """Return a bytestring representation of the event, in the format required for
         writing into a standard midi file.
         """
-        midibytes = b""
         code = 0xFF
         subcode = 0x58
-        varTime = writeVarLength(self.tick - previous_event_tick)
-        for timeByte in varTime:
-            midibytes += struct.pack('>B', timeByte)
-        midibytes += struct.pack('>B', code)
-        midibytes += struct.pack('>B', subcode)
-        midibytes += struct.pack('>B', 0x04)
-        midibytes += struct.pack('>B', self.numerator)
-        midibytes += struct.pack('>B', self.denominator)
-        midibytes += struct.pack('>B', self.clocks_per_tick)
-        # 32nd notes per quarter note
-        midibytes += struct.pack('>B', self.notes_per_quarter)
+        midibytes = packEvent(self.tick - previous_event_tick, metaEventStruct,
+                              code, subcode, 0x04)
+        # the last byte is 32nd notes per quarter note
+        midibytes += struct.pack('>BBBB', self.numerator, self.denominator,
+                                 self.clocks_per_tick, self.notes_per_quarter)
         return midibytes
 
 
+# The secondary sort order of a note event, by its status byte
+noteSortOrders = {NoteOff.midi_status: NoteOff.sec_sort_order,
+                  NoteOn.midi_status: NoteOn.sec_sort_order}
+
+# Sorts (tick, sec_sort_order, insertion_order, event) rows like sort_events
+sortRows = operator.itemgetter(0, 1, 2)
+
+
 class MIDITrack(object):
     '''
     A class that encapsulates a MIDI track
@@ -642,10 +540,22 @@ class MIDITrack(object):
         '''
         self.headerString = struct.pack('cccc', b'M', b'T', b'r', b'k')
         self.dataLength = 0  # Is calculated after the data is in place
-        self.MIDIdata = b""
+        self.MIDIdata = bytearray()
         self.closed = False
         self.eventList = []
         self.MIDIEventList = []
+        # Notes make up most of a track, so rather than as event objects they
+        # are stored column-wise, with one row per NoteOn or NoteOff event.
+        self.noteTicks = array('i')
+        self.noteTypes = array('B')  # the status byte of NoteOn or NoteOff
+        self.noteChannels = array('B')
+        self.notePitches = array('B')
+        self.noteVolumes = array('B')
+        self.noteOrders = array('i')  # insertion order
+        self.noteAnnotations = {}  # row: annotation, for annotated notes only
+        # the rows that are written, in chronological order once closed
+        self.noteOrder = array('i')
+        self.origin = 0
         self.remdep = removeDuplicates
         self.deinterleave = deinterleave
 
@@ -653,17 +563,80 @@ class MIDITrack(object):
                         annotation=None, insertion_order=0):
         '''
         Add a note by chromatic MIDI number
+
+        A note without duration is dropped, since its NoteOff would sort
+        before its NoteOn and leave it sounding.
         '''
-        self.eventList.append(NoteOn(channel, pitch, tick, duration, volume,
-                                     annotation=annotation,
-                                     insertion_order=insertion_order))
+        if duration == 0:
+            return
+        if annotation is not None:
+            self.noteAnnotations[len(self.noteTicks)] = annotation
+        self.addNoteEvent(NoteOn.midi_status, channel, pitch, tick, volume,
+                          insertion_order)
 
         # This event is not in chronological order. But before writing all the
-        # events to the file, I sort self.eventlist on (tick, sec_sort_order, insertion_order)
+        # events to the file, I sort the note rows on (tick, sec_sort_order, insertion_order)
         # which puts the events in chronological order.
-        self.eventList.append(NoteOff(channel, pitch, tick + duration, volume,
-                                      annotation=annotation,
-                                      insertion_order=insertion_order))
+        self.addNoteEvent(NoteOff.midi_status, channel, pitch, tick + duration,
+                          volume, insertion_order)
+
+    def addNotes(self, channel, pitches, ticks, durations, volume,
+                 insertion_order=0):
+        '''
+        Add many notes at once, numbered from insertion_order.
+
+        The NoteOn rows are added in one block and the NoteOff rows in
+        another, which sorts the same way as adding each note in turn.
+        Notes without duration are dropped, as by :meth:`addNoteByNumber`.
+        '''
+        if not 0 <= channel <= 15:
+            raise ValueError("MIDI channels must be between 0 and 15")
+        if pitches and not 0 <= min(pitches) <= max(pitches) <= 127:
+            raise ValueError("MIDI pitches must be between 0 and 127")
+        if 0 in durations:
+            kept = [duration != 0 for duration in durations]
+            pitches = list(itertools.compress(pitches, kept))
+            ticks = list(itertools.compress(ticks, kept))
+            durations = list(itertools.compress(durations, kept))
+            orders = list(itertools.compress(
+                range(insertion_order, insertion_order + len(kept)), kept))
+        else:
+            orders = range(insertion_order, insertion_order + len(pitches))
+        noteCount = len(pitches)
+        offTicks = [tick + duration for tick, duration in zip(ticks, durations)]
+        # Every column is built before any is extended, so a value that does
+        # not fit its column leaves the track as it was.
+        newTicks = array('i', itertools.chain(ticks, offTicks))
+        newTypes = array('B', bytes((NoteOn.midi_status,)) * noteCount +
+                         bytes((NoteOff.midi_status,)) * noteCount)
+        newChannels = array('B', bytes((channel,)) * (2 * noteCount))
+        newPitches = array('B', pitches) * 2
+        newVolumes = array('B', bytes((volume,)) * (2 * noteCount))
+        newOrders = array('i', orders) * 2
+
+        self.noteTicks.extend(newTicks)
+        self.noteTypes.extend(newTypes)
+        self.noteChannels.extend(newChannels)
+        self.notePitches.extend(newPitches)
+        self.noteVolumes.extend(newVolumes)
+        self.noteOrders.extend(newOrders)
+
+    def addNoteEvent(self, status, channel, pitch, tick, volume,
+                     insertion_order):
+        '''
+        Add a row to the note columns.
+        '''
+        # duplicate and de-interleaving keys hold 4 bits of channel, 7 of pitch
+        if not 0 <= channel <= 15:
+            raise ValueError("MIDI channels must be between 0 and 15")
+        if not 0 <= pitch <= 127:
+            raise ValueError("MIDI pitches must be between 0 and 127")
+        self.noteTicks.append(tick)
+        self.noteTypes.append(status)
+        self.noteChannels.append(channel)
+        self.notePitches.append(pitch)
+        self.noteVolumes.append(volume)
+        self.noteOrders.append(insertion_order)
 
     def addControllerEvent(self, channel, tick, controller_number, parameter,
                            insertion_order=0):
@@ -778,31 +751,58 @@ class MIDITrack(object):
         '''
         Process the event list, creating a MIDIEventList,
         which is then sorted to be in chronological order by start tick.
+        The note rows are sorted in the same way.
         '''
 
         self.MIDIEventList = [evt for evt in self.eventList]
         # Assumptions in the code expect the list to be time-sorted.
         self.MIDIEventList.sort(key=sort_events)
+        self.noteOrder = self.sortNotes(self.noteOrder)
 
         if self.deinterleave:
             self.deInterleaveNotes()
 
+    def sortNotes(self, rows):
+        '''
+        Return note rows in the order that sort_events gives event objects.
+
+        The columns are not moved; only the row indices are sorted, on an
+        integer that packs (tick, sec_sort_order, insertion_order).
+        '''
+        ticks = self.noteTicks
+        types = self.noteTypes
+        orders = self.noteOrders
+        return array('i', sorted(rows, key=lambda row: (
+            ticks[row] << 34 | noteSortOrders[types[row]] << 32 | orders[row])))
+
     def removeDuplicates(self):
         '''
-        Remove duplicates from the eventList.
+        Remove duplicates from the eventList and the note rows.
 
         This function will remove duplicates from the eventList. This is
         necessary because we the MIDI event stream can become confused
-        otherwise.
+        otherwise. The first of any duplicate events is kept, in a single
+        pass, and the order is left for processEventList to sort.
         '''
 
         # For this algorithm to work, the events in the eventList must be
         # hashable (that is, they must have a __hash__() and __eq__() function
         # defined).
 
-        s = set(self.eventList)
-        self.eventList = list(s)
-        self.eventList.sort(key=sort_events)
+        self.eventList = list(dict.fromkeys(self.eventList))
+
+        # Like their event objects, note rows are equal if they are of the same
+        # type, tick, channel and pitch, which are packed into a single integer.
+        noteKeys = set()
+        keptRows = array('i')
+        for row, (status, tick, channel, pitch) in enumerate(zip(
+                self.noteTypes, self.noteTicks, self.noteChannels,
+                self.notePitches)):
+            noteKey = tick << 19 | status << 11 | channel << 7 | pitch
+            if noteKey not in noteKeys:
+                noteKeys.add(noteKey)
+                keptRows.append(row)
+        self.noteOrder = keptRows
 
     def closeTrack(self):
         '''
@@ -819,6 +819,7 @@ class MIDITrack(object):
             return
         self.closed = True
 
+        self.noteOrder = array('i', range(len(self.noteTicks)))
         if self.remdep:
             self.removeDuplicates()
 
@@ -843,16 +844,37 @@ class MIDITrack(object):
 
     def writeEventsToStream(self):
         '''
-        Write the events in MIDIEvents to the MIDI stream.
-        MIDIEventList is presumed to be already sorted in chronological order.
-        '''
-        previous_event_tick = 0
-        for event in self.MIDIEventList:
-            self.MIDIdata += event.serialize(previous_event_tick)
-            # previous_event_tick = event.tick
-            # I do not like that adjustTimeAndOrigin() changes GenericEvent.tick
-            # from absolute to relative. I intend to change that, and just
-            # calculate the relative tick here, without changing GenericEvent.tick
+        Write the events in MIDIEvents and the note rows to the MIDI stream.
+        Both are presumed to be already sorted in chronological order, and
+        are merged as they are written.
+
+        The stream is a bytearray, so appending each event is amortized
+        constant time and the track is serialized in linear time.
+        '''
+        ticks = self.noteTicks
+        types = self.noteTypes
+        channels = self.noteChannels
+        pitches = self.notePitches
+        volumes = self.noteVolumes
+        orders = self.noteOrders
+
+        noteRows = ((ticks[row], noteSortOrders[types[row]], orders[row], row)
+                    for row in self.noteOrder)
+        eventRows = ((event.tick, event.sec_sort_order, event.insertion_order,
+                      event) for event in self.MIDIEventList)
+
+        midibytes = self.MIDIdata
+        # Ticks are absolute, and made relative to the previous event here.
+        previous_event_tick = self.origin
+        for tick, _, _, event in heapq.merge(eventRows, noteRows, key=sortRows):
+            if event.__class__ is int:
+                midibytes += packEvent(tick - previous_event_tick,
+                                       channelEventStruct,
+                                       types[event] | channels[event],
+                                       pitches[event], volumes[event])
+            else:
+                midibytes += event.serialize(previous_event_tick)
+            previous_event_tick = tick
 
     def deInterleaveNotes(self):
         '''
@@ -861,64 +883,47 @@ class MIDITrack(object):
         Because we are writing multiple notes in no particular order, we
         can have notes which are interleaved with respect to their start
         and stop times. This method will correct that. It expects that the
-        MIDIEventList has been time-ordered.
-        '''
-
-        tempEventList = []
-        stack = {}
-
-        for event in self.MIDIEventList:
-            if event.evtname in ['NoteOn', 'NoteOff']:
-                # !!! Pitch 101 channel 5 produces the same key as pitch 10 channel 15.
-                # !!! This is not the only pair of pitch,channel tuples which
-                # !!! collide to the same key, just one example.  Should fix by
-                # !!! putting a separator char between pitch and channel.
-                noteeventkey = str(event.pitch) + str(event.channel)
-                if event.evtname == 'NoteOn':
-                    if noteeventkey in stack:
-                        stack[noteeventkey].append(event.tick)
-                    else:
-                        stack[noteeventkey] = [event.tick]
-                    tempEventList.append(event)
-                elif event.evtname == 'NoteOff':
-                    if len(stack[noteeventkey]) > 1:
-                        event.tick = stack[noteeventkey].pop()
-                        tempEventList.append(event)
-                    else:
-                        stack[noteeventkey].pop()
-                        tempEventList.append(event)
-            else:
-                tempEventList.append(event)
-
-        self.MIDIEventList = tempEventList
+        note rows have been time-ordered.
+        '''
+
+        # One stack of sounding NoteOn ticks for each (channel, pitch), indexed
+        # by channel << 7 | pitch, so no two notes can share a stack.
+        stack = [[] for _ in range(16 * 128)]
+        moved = False
+        ticks = self.noteTicks
+        types = self.noteTypes
+        pitches = self.notePitches
+        channels = self.noteChannels
+        noteOnStatus = NoteOn.midi_status
+
+        for row in self.noteOrder:
+            noteStack = stack[channels[row] << 7 | pitches[row]]
+            if types[row] == noteOnStatus:
+                noteStack.append(ticks[row])
+            elif len(noteStack) > 1:
+                ticks[row] = noteStack.pop()
+                moved = True
+            elif noteStack:
+                # the NoteOn of a duplicate note was removed, so the NoteOff
+                # of the second copy finds nothing to close
+                noteStack.pop()
 
         # Note NoteOff events have a lower secondary sort key than NoteOn
         # events, so this sort will make concomitant NoteOff events
-        # processed first.
+        # processed first. Only moved notes can be out of order.
 
-        self.MIDIEventList.sort(key=sort_events)
+        if moved:
+            self.noteOrder = self.sortNotes(self.noteOrder)
 
     def adjustTimeAndOrigin(self, origin, adjust):
         '''
-        Adjust Times to be relative, and zero-origined.
+        Set the origin that times are written relative to.
 
-        If adjust is True, the track will be shifted. Regardelss times
-        are converted to relative values here.
+        If adjust is True, the track will be shifted. Regardless, times
+        are converted to relative values when the stream is written.
         '''
 
-        if len(self.MIDIEventList) == 0:
-            return
-        tempEventList = []
-        internal_origin = origin if adjust else 0
-        runningTick = 0
-
-        for event in self.MIDIEventList:
-            adjustedTick = event.tick - internal_origin
-            event.tick = adjustedTick - runningTick
-            runningTick = adjustedTick
-            tempEventList.append(event)
-
-        self.MIDIEventList = tempEventList
+        self.origin = origin if adjust else 0
 
     def writeTrack(self, fileHandle):
         '''
@@ -1107,6 +1112,47 @@ class MIDIFile(object):
                                            insertion_order=self.event_counter)
         self.event_counter += 1
 
+    def addNotes(self, track, channel, notes, volume):
+        """
+
+        Add a whole voice of notes to the MIDIFile object
+
+        :param track: The track to which the notes are added.
+        :param channel: the MIDI channel to assign to the notes. [Integer, 0-15]
+        :param notes: An iterable of (pitch, time, duration) notes, such as a
+            list of ``Voice.Note``, or an object with parallel ``pitches``,
+            ``times`` and ``durations`` columns. Like :meth:`addNote`, time
+            and duration are either quarter notes or ticks. Rests have a
+            negative pitch, or in a list of notes any pitch that is not an
+            integer, and are skipped.
+        :param volume: the volume (velocity) of the notes. [Integer, 0-127].
+
+        This is the same as calling :meth:`addNote` for each note, but the
+        notes are added to the track in bulk.
+        """
+        if self.header.numeric_format == 1:
+            track += 1
+        if hasattr(notes, 'pitches'):
+            pitches, times, durations = notes.pitches, notes.times, notes.durations
+            # pitch columns only hold integers, with rests below zero
+            sounding = [pitch >= 0 for pitch in pitches]
+        else:
+            notes = list(notes)
+            pitches = [note[0] for note in notes]
+            times = [note[1] for note in notes]
+            durations = [note[2] for note in notes]
+            sounding = [isinstance(pitch, int) and pitch >= 0
+                        for pitch in pitches]
+
+        pitches = list(itertools.compress(pitches, sounding))
+        ticks = [self.time_to_ticks(time)
+                 for time in itertools.compress(times, sounding)]
+        durations = [self.time_to_ticks(duration)
+                     for duration in itertools.compress(durations, sounding)]
+        self.tracks[track].addNotes(channel, pitches, ticks, durations, volume,
+                                    insertion_order=self.event_counter)
+        self.event_counter += len(pitches)
+
     def addTrackName(self, track, time, trackName):
         """
         Name a track.
@@ -1622,18 +1668,20 @@ class MIDIFile(object):
                                              insertion_order=self.event_counter)  # noqa: E128
         self.event_counter += 1
 
-    def writeFile(self, fileHandle):
+    def writeFile(self, fileHandle, executor=None):
         '''
         Write the MIDI File.
 
         :param fileHandle: A file handle that has been opened for binary
             writing.
+        :param executor: An optional :class:`concurrent.futures.Executor`
+            that encodes the tracks in parallel. See :meth:`close`.
         '''
 
         self.header.writeFile(fileHandle)
 
         # Close the tracks and have them create the MIDI event data structures.
-        self.close()
+        self.close(executor)
 
         # Write the MIDI Events to file.
         for i in range(0, self.numTracks):
@@ -1655,6 +1703,8 @@ class MIDIFile(object):
                 for event in track.eventList:
                     if event.tick < origin:
                         origin = event.tick
+            if len(track.noteTicks) > 0:
+                origin = min(origin, min(track.noteTicks))
 
         for track in self.tracks:
             tempEventList = []
@@ -1668,57 +1718,308 @@ class MIDIFile(object):
                 tempEventList.append(event)
 
             track.eventList = tempEventList
+            track.noteTicks = array('i', (tick - origin + tick_offset
+                                          for tick in track.noteTicks))
 
     # End Public Functions ########################
 
-    def close(self):
+    def close(self, executor=None):
         '''
         Close the MIDIFile for further writing.
 
         To close the File for events, we must close the tracks, adjust the time
         to be zero-origined, and have the tracks write to their MIDI Stream
         data structure.
+
+        Once the origin is known the tracks are independent, so they may be
+        encoded in parallel by an executor. A process pool suits long files,
+        as encoding is pure Python. Either way the tracks are kept in their
+        original order, so the output does not depend on the executor.
         '''
 
         if self.closed:
             return
 
-        for i in range(0, self.numTracks):
-            self.tracks[i].closeTrack()
-            # We want things like program changes to come before notes when
-            # they are at the same time, so we sort the MIDI events by both
-            # their start time and a secondary ordinality defined for each kind
-            # of event.
-            self.tracks[i].MIDIEventList.sort(key=sort_events)
-
         origin = self.findOrigin()
 
-        for i in range(0, self.numTracks):
-            self.tracks[i].adjustTimeAndOrigin(origin, self.adjust_origin)
-            self.tracks[i].writeMIDIStream()
+        # We want things like program changes to come before notes when
+        # they are at the same time, so the tracks sort the MIDI events by both
+        # their start time and a secondary ordinality defined for each kind
+        # of event.
+        if executor is None:
+            encodedTracks = [encodeTrack(track, origin, self.adjust_origin)
+                             for track in self.tracks]
+        else:
+            encodedTracks = executor.map(encodeTrack, self.tracks,
+                                         itertools.repeat(origin),
+                                         itertools.repeat(self.adjust_origin))
+        self.tracks = list(encodedTracks)
 
         self.closed = True
 
     def findOrigin(self):
         '''
-        Find the earliest time in the file's tracks.append.
+        Find the earliest time in the file's tracks.
+
+        Closing a track never moves an event before the earliest event that
+        was added, so the tracks need not have been closed or sorted.
         '''
         origin = 100000000  # A little silly, but we'll assume big enough
 
-    # Note: This code assumes that the MIDIEventList has been sorted, so this
-    # should be insured before it is called. It is probably a poor design to do
-    # this.
-    # TODO: -- Consider making this less efficient but more robust by not
-    #          assuming the list to be sorted.
-
         for track in self.tracks:
-            if len(track.MIDIEventList) > 0:
-                if track.MIDIEventList[0].tick < origin:
-                    origin = track.MIDIEventList[0].tick
+            for event in track.eventList:
+                if event.tick < origin:
+                    origin = event.tick
+            if len(track.noteTicks) > 0:
+                origin = min(origin, min(track.noteTicks))
 
         return origin
 
 
+def encodeTrack(track, origin, adjust):
+    '''
+    Close a track and write its MIDI stream, returning the encoded track.
+
+    This is a module level function so that process pools can run it.
+    '''
+    track.closeTrack()
+    track.adjustTimeAndOrigin(origin, adjust)
+    track.writeMIDIStream()
+    return track
+
+
+class MIDIStreamWriter(object):
+    '''
+    Write a MIDI file one track at a time, without building an event list.
+
+    Notes must be added in the order in which they start, as each voice of a
+    generated score already is. Events are written to the file handle as
+    they are added, and note off events wait in a heap only until the stream
+    reaches their tick, so memory use depends on how many notes sound at
+    once rather than on the length of the piece.
+
+    Tracks are written in file order. In a format 1 file the first track
+    should hold the tempo events, which :class:`MIDIFile` does automatically.
+
+    Example:
+
+    .. code::
+
+        with open("song.mid", "wb") as fileHandle:
+            writer = MIDIStreamWriter(fileHandle, 2)
+            writer.startTrack()
+            writer.addTempo(0, 90)
+            writer.endTrack()
+            writer.startTrack()
+            writer.addNote(0, 60, 0, 960, 100)
+            writer.endTrack()
+    '''
+
+    def __init__(self, fileHandle, numTracks=1, file_format=1,
+                 ticks_per_quarternote=TICKSPERQUARTERNOTE):
+        '''
+        Write the file header.
+
+        :param fileHandle: A file handle that has been opened for binary
+            writing.
+        :param numTracks: The number of track chunks in the file, including
+            the tempo track of a format 1 file.
+        '''
+        self.fileHandle = fileHandle
+        self.numTracks = numTracks
+        self.tracksWritten = 0
+        self.trackOpen = False
+        # seekable files have their track length patched in after the fact
+        self.seekable = fileHandle.seekable()
+        MIDIHeader(numTracks, file_format,
+                   ticks_per_quarternote).writeFile(fileHandle)
+
+    def startTrack(self):
+        '''
+        Begin the next track chunk.
+        '''
+        if self.trackOpen:
+            self.endTrack()
+        if self.tracksWritten == self.numTracks:
+            raise ValueError("All %d tracks have been written" % self.numTracks)
+        self.trackOpen = True
+        self.previousTick = 0
+        self.dataLength = 0
+        # (tick, note count, channel, pitch, volume) of every sounding note
+        self.pendingNoteOffs = []
+        self.noteCount = 0
+        if self.seekable:
+            self.fileHandle.write(b'MTrk')
+            self.lengthOffset = self.fileHandle.tell()
+            self.fileHandle.write(b'\x00\x00\x00\x00')
+        else:
+            self.trackData = bytearray()
+
+    def writeEvent(self, tick, midibytes):
+        '''
+        Write the bytes of an event that happens at a tick, which may not be
+        before the previous event.
+        '''
+        if not self.trackOpen:
+            raise ValueError("startTrack() must be called before adding events")
+        if tick < self.previousTick:
+            raise ValueError("Events must be added in time order")
+        self.previousTick = tick
+        self.dataLength += len(midibytes)
+        if self.seekable:
+            self.fileHandle.write(midibytes)
+        else:
+            self.trackData += midibytes
+
+    def writeNoteOff(self, tick, channel, pitch, volume):
+        '''
+        Write the note off event of a note that has ended.
+        '''
+        self.writeEvent(tick, packEvent(
+            tick - self.previousTick, channelEventStruct,
+            NoteOff.midi_status | channel, pitch, volume))
+
+    def flushNoteOffs(self, tick, inclusive=True):
+        '''
+        Write the note off events that happen before (or at) a tick.
+        '''
+        pendingNoteOffs = self.pendingNoteOffs
+        while pendingNoteOffs and (pendingNoteOffs[0][0] < tick or
+                                   inclusive and pendingNoteOffs[0][0] == tick):
+            noteOffTick, _, channel, pitch, volume = heapq.heappop(pendingNoteOffs)
+            self.writeNoteOff(noteOffTick, channel, pitch, volume)
+
+    def addNote(self, channel, pitch, tick, duration, volume):
+        '''
+        Add a note, which may not start before the previously added note.
+
+        A note that is struck again while it is still sounding is cut short,
+        as :meth:`MIDITrack.deInterleaveNotes` does, and a note without
+        duration is dropped, as :meth:`MIDITrack.addNoteByNumber` does.
+        '''
+        if duration == 0:
+            return
+        pendingNoteOffs = self.pendingNoteOffs
+        sounding = [noteIndex for noteIndex, noteOff in enumerate(pendingNoteOffs)
+                    if noteOff[0] > tick and noteOff[2] == channel and
+                    noteOff[3] == pitch]
+        if sounding:
+            # the note that would end first now ends where it is struck again
+            noteIndex = min(sounding, key=pendingNoteOffs.__getitem__)
+            pendingNoteOffs[noteIndex] = (tick,) + pendingNoteOffs[noteIndex][1:]
+            heapq.heapify(pendingNoteOffs)
+        self.flushNoteOffs(tick)
+        self.writeEvent(tick, packEvent(
+            tick - self.previousTick, channelEventStruct,
+            NoteOn.midi_status | channel, pitch, volume))
+        heapq.heappush(pendingNoteOffs,
+                       (tick + duration, self.noteCount, channel, pitch, volume))
+        self.noteCount += 1
+
+    def addEvent(self, event):
+        '''
+        Add any other event, such as a :class:`Tempo` or :class:`ProgramChange`.
+        '''
+        # these events sort before the notes that start at the same tick
+        self.flushNoteOffs(event.tick, event.sec_sort_order >= NoteOff.sec_sort_order)
+        self.writeEvent(event.tick, event.serialize(self.previousTick))
+
+    def addNotes(self, channel, notes, volume):
+        '''
+        Add a voice of (pitch, tick, duration) notes in the order in which
+        they start. Rests are skipped, as by :meth:`MIDIFile.addNotes`.
+        '''
+        if hasattr(notes, 'pitches'):
+            # pitch columns only hold integers, with rests below zero
+            notes = (note for note in zip(notes.pitches, notes.times,
+                                          notes.durations) if note[0] >= 0)
+        else:
+            notes = (note for note in notes
+                     if isinstance(note[0], int) and note[0] >= 0)
+        for pitch, tick, duration in notes:
+            self.addNote(channel, pitch, tick, duration, volume)
+
+    def addTempo(self, tick, tempo):
+        '''
+        Add a tempo change, in beats per minute.
+        '''
+        self.addEvent(Tempo(tick, tempo))
+
+    def addProgramChange(self, channel, tick, program):
+        '''
+        Add a program (instrument) change.
+        '''
+        self.addEvent(ProgramChange(channel, tick, program))
+
+    def endTrack(self):
+        '''
+        Write the remaining note offs and close the current track chunk.
+        '''
+        if not self.trackOpen:
+            return
+        self.flushNoteOffs(float("inf"))
+        self.writeEvent(self.previousTick, struct.pack('BBBB', 0x00, 0xFF, 0x2F, 0x00))
+        self.trackOpen = False
+        self.tracksWritten += 1
+        if self.seekable:
+            trackEnd = self.fileHandle.tell()
+            self.fileHandle.seek(self.lengthOffset)
+            self.fileHandle.write(struct.pack('>L', self.dataLength))
+            self.fileHandle.seek(trackEnd)
+        else:
+            self.fileHandle.write(b'MTrk')
+            self.fileHandle.write(struct.pack('>L', self.dataLength))
+            self.fileHandle.write(self.trackData)
+            self.trackData = None
+
+    def close(self):
+        '''
+        Finish the current track, and check that every track was written.
+        '''
+        self.endTrack()
+        if self.tracksWritten != self.numTracks:
+            raise ValueError("Only %d of %d tracks were written" %
+                             (self.tracksWritten, self.numTracks))
+
+
+def encodeVarLength(i):
+    '''
+    Serialize an integer as a MIDI file variable length quantity, without
+    looking it up. See :func:`writeVarLength`.
+    '''
+    if i == 0:
+        return b'\x00'
+
+    vlbytes = bytearray()
+    hibit = 0x00  # low-order byte has high bit cleared.
+    while i > 0:
+        vlbytes.append(((i & 0x7f) | hibit) & 0xff)
+        i >>= 7
+        hibit = 0x80
+    vlbytes.reverse()  # put most-significant byte first, least significant last
+    return bytes(vlbytes)
+
+
+# Every quantity of up to two bytes is encoded up front, which covers the delta
+# times of nearly all events. Three byte quantities (up to 2^21) are cached as
+# they are used, since a full table of them would take tens of megabytes.
+def makeVarLengthTable():
+    '''
+    Encode every quantity below 2^14. The two byte quantities are joined from
+    single bytes rather than encoded one at a time, which keeps importing this
+    module cheap.
+    '''
+    singleBytes = [bytes((i,)) for i in range(256)]
+    return tuple(singleBytes[:0x80]) + tuple(
+        highByte + lowByte for highByte in singleBytes[0x81:]
+        for lowByte in singleBytes[:0x80]
+    )
+
+
+varLengthTable = makeVarLengthTable()
+cachedVarLength = functools.lru_cache(maxsize=4096)(encodeVarLength)
+
+
 def writeVarLength(i):
     '''
     Accept an integer, and serialize it as a MIDI file variable length quantity
@@ -1738,18 +2039,30 @@ def writeVarLength(i):
     8192    C0 00
     16383   FF 7F
     16384   81 80 00
+
+    The quantity is returned as ready-made bytes, from a lookup table or
+    cache for values below 2^21.
     '''
-    if i == 0:
-        return [0]
+    if 0 <= i < 16384:
+        return varLengthTable[i]
+    if i < 2097152:
+        return cachedVarLength(i)
+    return encodeVarLength(i)
 
-    vlbytes = []
-    hibit = 0x00  # low-order byte has high bit cleared.
-    while i > 0:
-        vlbytes.append(((i & 0x7f) | hibit) & 0xff)
-        i >>= 7
-        hibit = 0x80
-    vlbytes.reverse()  # put most-significant byte first, least significant last
-    return vlbytes
+
+def packEvent(deltaTick, eventStruct, *fields):
+    '''
+    Serialize a delta time followed by the fixed-size bytes of an event.
+
+    The event is packed into a single preallocated bytearray, which callers
+    may extend with any variable-length payload.
+    '''
+    varTime = writeVarLength(deltaTick)
+    timeLength = len(varTime)
+    midibytes = bytearray(timeLength + eventStruct.size)
+    midibytes[:timeLength] = varTime
+    eventStruct.pack_into(midibytes, timeLength, *fields)
+    return midibytes
 
 
 # readVarLength is taken from the MidiFile class.
@@ -1775,6 +2088,175 @@ def readVarLength(offset, buffer):
     return (output, bytesRead)
 
 
+def readMIDIFile(source):
+    '''
+    Read a standard MIDI file into an unclosed :class:`MIDIFile`.
+
+    :param source: The path of a MIDI file, which is memory mapped, or a
+        bytes-like object holding one.
+
+    The chunks are parsed in place through a memoryview, and notes are
+    stored in the same columns that :meth:`MIDIFile.addNote` fills, with
+    each event's insertion order being its position in the file. Writing
+    the result out again reproduces a file written by :meth:`MIDIFile.writeFile`
+    byte for byte, which makes for a round-trip check of the writer.
+    '''
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as midiMap:
+                return readMIDIBuffer(midiMap)
+    return readMIDIBuffer(source)
+
+
+def readMIDIBuffer(buffer):
+    '''
+    Parse the MThd and MTrk chunks of a MIDI file held in a buffer.
+    '''
+    with memoryview(buffer) as midiView:
+        chunkID, headerSize, file_format, numTracks, ticks_per_quarternote = \
+            struct.unpack_from('>4sLHHH', midiView, 0)
+        if chunkID != b'MThd':
+            raise ValueError("Not a standard MIDI file")
+
+        if file_format == 1:
+            # MIDIFile adds the tempo track itself
+            numTracks -= 1
+        # The events of a file were de-interleaved when it was written, and
+        # doing it again can close a different note, so they are kept as read.
+        midiFile = MIDIFile(numTracks, removeDuplicates=False,
+                            deinterleave=False, file_format=file_format,
+                            ticks_per_quarternote=ticks_per_quarternote,
+                            eventtime_is_ticks=True)
+
+        offset = 8 + headerSize
+        for track in midiFile.tracks:
+            chunkID, dataLength = struct.unpack_from('>4sL', midiView, offset)
+            while chunkID != b'MTrk':
+                # unknown chunks are skipped, as the standard asks
+                offset += 8 + dataLength
+                chunkID, dataLength = struct.unpack_from('>4sL', midiView, offset)
+            offset += 8
+            midiFile.event_counter = readTrack(
+                track, midiView, offset, offset + dataLength,
+                midiFile.event_counter)
+            offset += dataLength
+
+    return midiFile
+
+
+def readTrack(track, midiView, offset, end, insertion_order):
+    '''
+    Add the events of one track chunk to a track, returning the next
+    insertion order.
+    '''
+    tick = 0
+    status = None
+    while offset < end:
+        deltaTick, bytesRead = readVarLength(offset, midiView)
+        tick += deltaTick
+        offset += bytesRead
+
+        if midiView[offset] & 0x80:
+            status = midiView[offset]
+            offset += 1
+        elif status is None:
+            raise ValueError("Running status without a previous status byte")
+        # otherwise this is running status, and the data follows directly
+
+        eventType = status & 0xF0
+        channel = status & 0x0F
+        if eventType in (0x80, 0x90):
+            pitch, volume = midiView[offset], midiView[offset + 1]
+            offset += 2
+            if volume == 0:
+                # a NoteOn without volume is how many files end a note
+                eventType = NoteOff.midi_status
+            track.addNoteEvent(eventType, channel, pitch, tick, volume,
+                               insertion_order)
+        elif eventType == 0xA0:
+            # polyphonic aftertouch has no event class
+            offset += 2
+            continue
+        elif eventType == 0xB0:
+            track.addControllerEvent(channel, tick, midiView[offset],
+                                     midiView[offset + 1], insertion_order)
+            offset += 2
+        elif eventType == 0xC0:
+            track.addProgramChange(channel, tick, midiView[offset],
+                                   insertion_order)
+            offset += 1
+        elif eventType == 0xD0:
+            track.addChannelPressure(channel, tick, midiView[offset],
+                                     insertion_order)
+            offset += 1
+        elif eventType == 0xE0:
+            pitch_wheel_value = (midiView[offset + 1] << 7 |
+                                 midiView[offset]) - 8192
+            track.addPitchWheelEvent(channel, tick, pitch_wheel_value,
+                                     insertion_order)
+            offset += 2
+        elif status == 0xFF:
+            # meta events don't take part in running status
+            status = None
+            subcode = midiView[offset]
+            dataLength, bytesRead = readVarLength(offset + 1, midiView)
+            offset += 1 + bytesRead
+            data = midiView[offset:offset + dataLength]
+            offset += dataLength
+            if not readMetaEvent(track, tick, subcode, data, insertion_order):
+                continue
+        elif status in (0xF0, 0xF7):
+            status = None
+            dataLength, bytesRead = readVarLength(offset, midiView)
+            offset += bytesRead
+            data = bytes(midiView[offset:offset + dataLength])
+            offset += dataLength
+            if data[:1] in (b'\x7E', b'\x7F'):
+                track.addUniversalSysEx(tick, data[2], data[3], data[4:-1],
+                                        sysExChannel=data[1],
+                                        realTime=data[0] == 0x7F,
+                                        insertion_order=insertion_order)
+            elif data:
+                track.addSysEx(tick, data[0], data[1:-1], insertion_order)
+            else:
+                continue
+        else:
+            raise ValueError("Unknown MIDI status byte 0x%02X" % status)
+
+        insertion_order += 1
+
+    return insertion_order
+
+
+def readMetaEvent(track, tick, subcode, data, insertion_order):
+    '''
+    Add a meta event to a track, returning False if it was not kept.
+    '''
+    if subcode == 0x51:
+        event = Tempo(tick, 1, insertion_order=insertion_order)
+        # the tempo is stored in microseconds per quarter note, as written
+        event.tempo = int.from_bytes(data, 'big')
+    elif subcode == 0x58:
+        event = TimeSignature(tick, data[0], data[1], data[2], data[3],
+                              insertion_order=insertion_order)
+    elif subcode == 0x59:
+        accidentals = struct.unpack_from('>b', data, 0)[0]
+        event = KeySignature(tick, abs(accidentals),
+                             FLATS if accidentals < 0 else SHARPS, data[1],
+                             insertion_order=insertion_order)
+    elif subcode in (0x01, 0x02, 0x03):
+        # the text is kept encoded, exactly as it was written
+        eventClass = {0x01: Text, 0x02: Copyright, 0x03: TrackName}[subcode]
+        event = eventClass(tick, "", insertion_order=insertion_order)
+        setattr(event, {0x01: 'text', 0x02: 'notice', 0x03: 'trackName'}[subcode],
+                bytes(data))
+    else:
+        # the end of track is written anew, and other meta events are ignored
+        return False
+    track.eventList.append(event)
+    return True
+
+
 def frequencyTransform(freq):
     '''
     Returns a three-byte transform of a frequency.
@@ -0,0 +1,212 @@
+import collections
+import contextlib
+import io
+import os
+import random
+import types
+
+from generate.idioms.score import Score
+from generate.render import load_lily_template
+import generate.voices.chorale as chorale
+from generate.voices.melody import Melody
+from generate.voices.voice import Voice
+
+def make_sheet_code(score=Voice):
+	"""Generate Lilypond text from musical sequence"""
+
+	if score.mode == "ionian":
+		mode = "major"
+	elif score.mode == "aeolian":
+		mode = "minor"
+	else:
+		mode = score.mode
+
+	if score.beat_division == 3:
+		time_sig = f"{score.measure_length * 3}/8"
+	elif score.beat_division == 2:
+		time_sig = f"{score.measure_length}/4"
+	title = f"Medley in {score.tonic} {mode}"
+
+	key_sig = score.tonic.replace('#', 'is').replace('b', "es").lower()
+	part_header = f"\\key {key_sig} \\{mode} \\time {time_sig}"
+	lily_parts = [f"{part_header} {lily_part}" for lily_part in score.lily_score]
+
+	return load_lily_template().fill(title, lily_parts)
+
+
+def reset_score_settings(score_args):
+	"""Reset parameters of score to allow creation of a new piece"""
+	Score.reset(
+		score_args.tonic, score_args.mode, score_args.style,
+		getattr(score_args, "time_sig", None), getattr(score_args, "form", None)
+	)
+	Voice.chord_sequence = []
+	Voice.all_midi_pitches = []
+	Voice.midi_score = []
+	Voice.lily_score = []
+	Voice.chorale_scale_degrees = []
+
+	Voice.pickup = False
+	Voice.pickup_duration = 0
+
+	if Score.log_dir is not None:
+		with open(os.path.join(Score.log_dir, "chorale.log"), 'w') as f:
+			pass
+		with open(os.path.join(Score.log_dir, "melody.log"), 'w') as f:
+			pass
+
+
+def make_score(score_args):
+	"""Create all voice parts, restarting after failed melodies or harmonies"""
+	while True:
+		try:
+			reset_score_settings(score_args)
+			Melody().make_melody()
+			harmony = chorale.Chorale()
+			harmony.create_parts()
+			chorale.Bass().create_part()
+			chorale.Tenor().create_part()
+			chorale.Alto().create_part()
+			chorale.Soprano().create_part()
+			return harmony
+		except AssertionError:
+			print("Restarting...\n")
+
+
+def add_strum_ending():
+	"""Randomly stagger the final chord of the accompaniment"""
+	strum_ending = random.choice((True, True, True, False))
+	print(f"Strum ending: {strum_ending}")
+	if strum_ending:
+		time_shift = 0
+		for voice_index, part in enumerate(Voice.midi_score[2:], 2):
+			time_shift += 90
+			old_midi_obj = Voice.midi_score[voice_index][-2]
+			new_midi_obj = Voice.Note(
+				old_midi_obj.pitch, old_midi_obj.time + time_shift,
+				old_midi_obj.duration,
+			)
+			Voice.midi_score[voice_index][-2] = new_midi_obj
+
+
+def make_tempo_map():
+	"""Choose the (time, BPM) tempo changes of the current score"""
+	# 3/4 time sig feels slower at same tempo because
+	# beats are in groups of 3 instead of 2
+	if Voice.time_sig == (3, 2):
+		MOD_SPEED = 1.5
+	else:
+		MOD_SPEED = 1
+	if Voice.mode == "aeolian":
+		tempo = random.choice(range(85, 101)) * MOD_SPEED
+	else:
+		tempo = random.choice(range(85, 111)) * MOD_SPEED
+	tempo_map = [(0, tempo)]
+
+	slow_ending = random.choice((True, False))
+	if slow_ending:
+		# slows down for the last few chords of the final period
+		if Voice.repeat_ending:
+			measure_mark = len(Voice.chord_sequence)
+		else:
+			measure_mark = len(Voice.chord_sequence) - 3
+		tempo_map.append(
+			(Voice.pickup_duration + Voice.max_note_duration * measure_mark,
+			tempo * 0.93)
+		)
+	print(f"Slow ending? {slow_ending}")
+	print(f"Tempo: {tempo}")
+
+	return tuple(tempo_map)
+
+
+class MIDIScore(collections.namedtuple("MIDIScore", ["note_sequences", "tempo_map"])):
+	"""Voice parts and tempo changes that are written out as a MIDI file"""
+
+	__slots__ = ()
+	# (channel, program) of the instrument set at the start of each voice
+	voice_programs = ((0, 73), (1, 32), (2, 32), (3, 32), (3, 32))
+
+	def write_file(self, output_file):
+		"""Stream the tempo track and then each voice into a MIDI file"""
+		# the MIDI writer isn't needed until the first piece is finished
+		from generate.midi_export import MIDIStreamWriter
+
+		midi_writer = MIDIStreamWriter(output_file, len(self.note_sequences) + 1)
+		midi_writer.startTrack()
+		for tempo_time, tempo in self.tempo_map:
+			midi_writer.addTempo(tempo_time, tempo)
+
+		# volume 0-127, as per the MIDI standard
+		voice_volumes = (100, *Voice.voice_volumes)
+		for channel, part in enumerate(self.note_sequences):
+			program_channel, program = self.voice_programs[channel]
+			midi_writer.startTrack()
+			midi_writer.addProgramChange(program_channel, 0, program)
+			midi_writer.addNotes(channel, part, voice_volumes[channel])
+		midi_writer.close()
+
+
+def make_midi_file():
+	"""Arrange the voice parts of the current score into a MIDI file"""
+	add_strum_ending()
+	tempo_map = make_tempo_map()
+	return MIDIScore(tuple(Voice.midi_score), tempo_map)
+
+
+class Piece(collections.namedtuple("Piece", [
+  "tonic", "mode", "time_sig", "form", "seed", "chord_sequence", "voicings",
+  "note_sequences", "tempo_map", "lily_text"])):
+	"""A finished piece of music held entirely in memory"""
+
+	__slots__ = ()
+
+	def make_midi_file(self):
+		"""Arrange the voice parts of the piece into a MIDI file"""
+		return MIDIScore(self.note_sequences, self.tempo_map)
+
+	def midi_data(self):
+		"""Return the contents of the MIDI file of the piece"""
+		midi_stream = io.BytesIO()
+		self.make_midi_file().write_file(midi_stream)
+		return midi_stream.getvalue()
+
+
+def generate_piece(
+  tonic=None, mode=None, style="Mm", seed=None, time_sig=None, form=None,
+  log_dir=None, verbose=False):
+	"""Create a piece without writing any files"""
+
+	score_args = types.SimpleNamespace(
+		tonic=tonic, mode=mode, style=style, time_sig=time_sig, form=form
+	)
+	random_state = random.getstate()
+	old_log_dir = Score.log_dir
+	if verbose:
+		output_context = contextlib.nullcontext()
+	else:
+		output_context = contextlib.redirect_stdout(io.StringIO())
+
+	with output_context:
+		try:
+			if seed is not None:
+				random.seed(seed)
+			Score.log_dir = log_dir
+			harmony = make_score(score_args)
+			add_strum_ending()
+			tempo_map = make_tempo_map()
+		finally:
+			Score.log_dir = old_log_dir
+			if seed is not None:
+				random.setstate(random_state)
+
+	return Piece(
+		tonic=Voice.tonic, mode=Voice.mode, time_sig=Voice.time_sig,
+		form=Voice.form, seed=seed,
+		chord_sequence=tuple(
+			chord_obj.chord_symbol for chord_obj in Voice.chord_sequence
+		),
+		voicings=tuple(tuple(voicing) for voicing in harmony.chosen_chord_voicings),
+		note_sequences=tuple(tuple(part) for part in Voice.midi_score),
+		tempo_map=tempo_map, lily_text=make_sheet_code(Voice),
+	)
@@ -0,0 +1,268 @@
+import abc
+import functools
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class RenderError(Exception):
+	"""A score could not be engraved into sheet music"""
+
+
+class LilyTemplate:
+	"""A sheet music layout split into fixed text and fillable slots"""
+
+	title_slot = "Medley"
+	part_slot = "PART_SLOT"
+
+	def __init__(self, template_text):
+		# empty strings are placeholders that are filled per piece
+		self.segments = []
+		self.title_indices = []
+		self.part_indices = []
+		for part_num, part_chunk in enumerate(template_text.split(self.part_slot)):
+			if part_num:
+				self.part_indices.append(len(self.segments))
+				self.segments.append("")
+			for title_num, title_chunk in enumerate(part_chunk.split(self.title_slot)):
+				if title_num:
+					self.title_indices.append(len(self.segments))
+					self.segments.append("")
+				self.segments.append(title_chunk)
+
+	def fill(self, title, lily_parts):
+		"""Assemble the sheet music of a piece, leaving unused slots empty"""
+		sheet_segments = self.segments[:]
+		for segment_index in self.title_indices:
+			sheet_segments[segment_index] = title
+		for segment_index, lily_part in zip(self.part_indices, lily_parts):
+			sheet_segments[segment_index] = lily_part
+		return "".join(sheet_segments)
+
+
+# found relative to the package, so pieces can be generated from any directory
+default_template_path = os.path.join(
+	os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs",
+	"old_layout.txt"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def load_lily_template(template_path=default_template_path):
+	"""Read and compile a sheet music layout once per process"""
+	with open(template_path, 'r') as f:
+		return LilyTemplate(f.read())
+
+
+class Renderer(abc.ABC):
+	"""Engraves LilyPond text into pdf sheet music on a bounded worker pool"""
+
+	def __init__(self, max_workers=2, max_pending=None):
+		self.max_workers = max_workers
+		if max_pending is None:
+			max_pending = max_workers * 2
+		# submissions block once too many scores are waiting to be engraved
+		self.pending_slots = threading.BoundedSemaphore(max_pending)
+		self.executor = None
+
+	@abc.abstractmethod
+	def render(self, sheet_code):
+		"""Return the pdf data of a LilyPond score"""
+
+	def render_file(self, sheet_code, pdf_path):
+		"""Engrave a LilyPond score into a pdf file"""
+		pdf_data = self.render(sheet_code)
+		with open(pdf_path, 'wb') as f:
+			f.write(pdf_data)
+		return pdf_path
+
+	def submit(self, sheet_code, pdf_path):
+		"""Queue a score for engraving and return its future"""
+		if self.executor is None:
+			# the first score arrives once its piece is made, so importing the
+			# pool here keeps it out of the time before the first note
+			import concurrent.futures
+
+			self.executor = concurrent.futures.ThreadPoolExecutor(
+				max_workers=self.max_workers
+			)
+		self.pending_slots.acquire()
+		try:
+			render_job = self.executor.submit(self.render_file, sheet_code, pdf_path)
+		except BaseException:
+			self.pending_slots.release()
+			raise
+		render_job.add_done_callback(lambda _: self.pending_slots.release())
+		return render_job
+
+	def close(self, wait=True):
+		"""Stop the worker pool after queued scores are engraved"""
+		if self.executor is not None:
+			self.executor.shutdown(wait=wait)
+			self.executor = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+
+class LilypondRenderer(Renderer):
+	"""Engraves scores offline with a local lilypond installation"""
+
+	def __init__(self, executable="lilypond", timeout=120, max_workers=None,
+	  max_pending=None):
+		if max_workers is None:
+			max_workers = os.cpu_count() or 1
+		super().__init__(max_workers, max_pending)
+		self.executable = executable
+		self.timeout = timeout
+
+	def render(self, sheet_code):
+		import shutil
+		import subprocess
+		import tempfile
+
+		executable = shutil.which(self.executable)
+		if executable is None:
+			raise RenderError(
+				f"Could not find {self.executable}. Install LilyPond or "
+				"choose another renderer."
+			)
+
+		with tempfile.TemporaryDirectory() as temp_dir:
+			lily_path = os.path.join(temp_dir, "score.ly")
+			output_base = os.path.join(temp_dir, "score")
+			with open(lily_path, 'w') as f:
+				f.write(sheet_code)
+			try:
+				subprocess.run(
+					(executable, "--pdf", "-o", output_base, lily_path),
+					cwd=temp_dir, capture_output=True, timeout=self.timeout,
+					check=True,
+				)
+			except subprocess.CalledProcessError as error:
+				error_message = error.stderr.decode(errors="replace").strip()
+				raise RenderError(f"LilyPond failed: {error_message}") from error
+			except subprocess.TimeoutExpired as error:
+				raise RenderError("LilyPond took too long.") from error
+
+			try:
+				with open(f"{output_base}.pdf", 'rb') as f:
+					return f.read()
+			except FileNotFoundError as error:
+				raise RenderError("LilyPond did not produce a pdf.") from error
+
+
+class LilybinRenderer(Renderer):
+	"""Engraves scores through the lilybin web API"""
+
+	preview_url = (
+		"https://7icpm9qr6a.execute-api.us-west-2.amazonaws.com/prod/prepare_preview/stable"
+	)
+	pdf_url = "https://s3-us-west-2.amazonaws.com/lilybin-scores/{}.pdf"
+
+	def __init__(self, preview_url=None, pdf_url=None, wait_time=1,
+	  max_workers=2, max_pending=None):
+		super().__init__(max_workers, max_pending)
+		if preview_url is not None:
+			self.preview_url = preview_url
+		if pdf_url is not None:
+			self.pdf_url = pdf_url
+		self.wait_time = wait_time
+
+	def render(self, sheet_code):
+		# only this renderer needs network access
+		import json
+		import requests
+
+		payload = {
+			"version": "stable", "code": sheet_code, "id": ""
+		}
+		try:
+			# AWS can't parse python dictionaries
+			sheet_music_response = requests.post(
+				self.preview_url, data=json.dumps(payload).encode()
+			)
+			sheet_music_response.raise_for_status()
+			# the pdf isn't available the moment its id is returned
+			time.sleep(self.wait_time)
+			response_id = sheet_music_response.json()["id"]
+
+			pdf_response = requests.get(self.pdf_url.format(response_id))
+			pdf_response.raise_for_status()
+		except requests.exceptions.RequestException as error:
+			rejection_message = "An error occured with the API and/or internet connection. "
+			rejection_message += "Check your internet connection and try again."
+			raise RenderError(rejection_message) from error
+
+		return pdf_response.content
+
+
+class RenderPipeline:
+	"""Writes finished pieces in the background while new ones are generated"""
+
+	def __init__(self, max_queued=2):
+		# generation blocks once too many pieces are waiting to be written
+		self.piece_queue = queue.Queue(maxsize=max_queued)
+		self.errors = []
+		self.worker = threading.Thread(target=self.process_pieces, daemon=True)
+		self.worker.start()
+
+	def submit(self, write_piece, *args):
+		"""Queue a piece to be written by the background stage"""
+		if not self.worker.is_alive():
+			raise RuntimeError("The render pipeline is closed")
+		self.piece_queue.put((write_piece, args))
+
+	def process_pieces(self):
+		"""Write queued pieces in the order they were generated"""
+		while True:
+			piece_task = self.piece_queue.get()
+			if piece_task is None:
+				return
+			write_piece, args = piece_task
+			try:
+				write_piece(*args)
+			except Exception as error:
+				self.errors.append(error)
+
+	def join(self):
+		"""Wait for every queued piece to be written"""
+		if self.worker.is_alive():
+			self.piece_queue.put(None)
+			self.worker.join()
+
+	def close(self):
+		"""Wait for every queued piece, then raise the first failed write"""
+		self.join()
+		if self.errors:
+			raise self.errors[0]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		if exc_type is None:
+			self.close()
+			return
+		# the error that stopped generation is kept, and failed writes are logged
+		self.join()
+		for error in self.errors:
+			logger.error("A piece could not be written", exc_info=error)
+
+
+renderers = {"lilypond": LilypondRenderer, "lilybin": LilybinRenderer}
+
+
+def make_renderer(renderer_name, **renderer_options):
+	"""Create a renderer from its command line name"""
+	try:
+		renderer_cls = renderers[renderer_name]
+	except KeyError:
+		raise ValueError(f"Invalid renderer: {renderer_name}") from None
+	return renderer_cls(**renderer_options)
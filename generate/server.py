@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import http
+import json
+import logging
+import os
+import random
+import urllib.parse
+
+from generate.idioms.chord import Chord
+from generate.idioms.score import Score
+from generate.piece import generate_piece
+from generate.render import load_lily_template
+
+logger = logging.getLogger(__name__)
+
+class RequestError(Exception):
+	"""A request that can't be answered with a piece"""
+
+	def __init__(self, status, message):
+		super().__init__(message)
+		self.status = status
+
+
+def warm_worker():
+	"""Prepare a worker process before it receives its first request"""
+	# forked workers would otherwise share the random state of the server
+	random.seed()
+	load_lily_template()
+	Chord.make_pitch_tables()
+
+
+def make_piece_data(piece_options):
+	"""Generate a piece in a worker process"""
+	piece = generate_piece(**piece_options)
+	return piece, piece.midi_data()
+
+
+def parse_time_sig(time_sig_name):
+	"""Read a time signature the way it appears on sheet music"""
+	try:
+		beats, beat_unit = map(int, time_sig_name.split('/'))
+	except ValueError:
+		raise RequestError(
+			http.HTTPStatus.BAD_REQUEST, f"Invalid time signature: {time_sig_name}"
+		) from None
+	if beat_unit == 8:
+		return (beats // 3, 3)
+	return (beats, beat_unit // 2)
+
+
+def parse_piece_options(query):
+	"""Convert the query string of a request into generate_piece arguments"""
+	piece_options = {}
+	for option_name, option_value in urllib.parse.parse_qsl(query):
+		if option_name in ("tonic", "mode", "style", "form"):
+			piece_options[option_name] = option_value
+		elif option_name == "seed":
+			try:
+				piece_options["seed"] = int(option_value)
+			except ValueError:
+				raise RequestError(
+					http.HTTPStatus.BAD_REQUEST, f"Invalid seed: {option_value}"
+				) from None
+		elif option_name == "time_sig":
+			piece_options["time_sig"] = parse_time_sig(option_value)
+		else:
+			raise RequestError(
+				http.HTTPStatus.BAD_REQUEST, f"Unknown option: {option_name}"
+			)
+	check_piece_options(piece_options)
+	return piece_options
+
+
+def check_piece_options(piece_options):
+	"""Refuse options that a new score would not accept"""
+	try:
+		Score.check_settings(
+			piece_options.get("tonic"), piece_options.get("mode"),
+			piece_options.get("style", "Mm"), piece_options.get("time_sig"),
+			piece_options.get("form")
+		)
+	except ValueError as error:
+		raise RequestError(http.HTTPStatus.BAD_REQUEST, str(error)) from None
+
+
+class GenerationServer:
+	"""Serves generated pieces over HTTP from a pool of warm worker processes"""
+
+	def __init__(self, host="127.0.0.1", port=8000, workers=None,
+	  max_queued=None, request_timeout=10):
+		if workers is None:
+			workers = os.cpu_count() or 1
+		if max_queued is None:
+			max_queued = workers * 4
+		self.host = host
+		self.port = port
+		self.workers = workers
+		self.max_queued = max_queued
+		self.request_timeout = request_timeout
+		self.pool = None
+		self.server = None
+		self.generation_slots = None
+		self.pending_pieces = 0
+
+	async def start(self):
+		"""Start the worker processes, then accept connections"""
+		loop = asyncio.get_running_loop()
+		self.pool = concurrent.futures.ProcessPoolExecutor(
+			self.workers, initializer=warm_worker
+		)
+		# every worker is started and warmed before the first request arrives
+		await asyncio.gather(*(
+			loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)
+		))
+		self.generation_slots = asyncio.Semaphore(self.workers)
+		self.server = await asyncio.start_server(
+			self.handle_connection, self.host, self.port
+		)
+		self.port = self.server.sockets[0].getsockname()[1]
+
+	async def serve_forever(self):
+		"""Serve requests until cancelled"""
+		if self.server is None:
+			await self.start()
+		try:
+			await self.server.serve_forever()
+		finally:
+			await self.close()
+
+	async def close(self):
+		"""Stop accepting connections and shut down the workers"""
+		if self.server is not None:
+			self.server.close()
+			await self.server.wait_closed()
+			self.server = None
+		if self.pool is not None:
+			self.pool.shutdown(cancel_futures=True)
+			self.pool = None
+
+	async def make_piece(self, piece_options):
+		"""Queue a piece for the next free worker"""
+		# requests beyond the queue are turned away instead of piling up
+		if self.pending_pieces >= self.workers + self.max_queued:
+			raise RequestError(
+				http.HTTPStatus.SERVICE_UNAVAILABLE, "Too many pieces are queued."
+			)
+		self.pending_pieces += 1
+		try:
+			async with self.generation_slots:
+				loop = asyncio.get_running_loop()
+				return await loop.run_in_executor(
+					self.pool, make_piece_data, piece_options
+				)
+		finally:
+			self.pending_pieces -= 1
+
+	async def respond(self, request_path):
+		"""Return the content type and body of the answer to a request"""
+		url_parts = urllib.parse.urlsplit(request_path)
+		if url_parts.path not in ("/piece", "/piece.mid", "/piece.ly"):
+			raise RequestError(http.HTTPStatus.NOT_FOUND, "Unknown path.")
+		piece, midi_data = await self.make_piece(
+			parse_piece_options(url_parts.query)
+		)
+
+		if url_parts.path == "/piece.mid":
+			return "audio/midi", midi_data
+		if url_parts.path == "/piece.ly":
+			return "text/plain; charset=utf-8", piece.lily_text.encode()
+		piece_fields = {
+			"tonic": piece.tonic, "mode": piece.mode, "time_sig": piece.time_sig,
+			"form": piece.form, "seed": piece.seed, "chord_sequence": piece.chord_sequence,
+			"voicings": piece.voicings, "tempo_map": piece.tempo_map,
+			"lily_text": piece.lily_text,
+			"midi": base64.b64encode(midi_data).decode(),
+		}
+		return "application/json", json.dumps(piece_fields).encode()
+
+	async def handle_connection(self, reader, writer):
+		"""Answer a single HTTP request"""
+		try:
+			try:
+				request_head = await asyncio.wait_for(
+					reader.readuntil(b"\r\n\r\n"), self.request_timeout
+				)
+				request_line = request_head.split(b"\r\n", 1)[0].decode("latin-1")
+				method, request_path, _ = request_line.split(' ', 2)
+			except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+			  asyncio.LimitOverrunError, ValueError):
+				status = http.HTTPStatus.BAD_REQUEST
+				content_type, body = "text/plain; charset=utf-8", b"Bad request."
+			else:
+				try:
+					if method != "GET":
+						raise RequestError(
+							http.HTTPStatus.METHOD_NOT_ALLOWED, "Only GET is supported."
+						)
+					content_type, body = await self.respond(request_path)
+					status = http.HTTPStatus.OK
+				except RequestError as error:
+					status = error.status
+					content_type, body = "text/plain; charset=utf-8", str(error).encode()
+				except Exception:
+					# a worker that died or a piece that couldn't be finished
+					logger.exception("Failed to answer %s", request_path)
+					status = http.HTTPStatus.INTERNAL_SERVER_ERROR
+					content_type, body = "text/plain; charset=utf-8", b"Generation failed."
+
+			response_head = (
+				f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+				f"Content-Type: {content_type}\r\n"
+				f"Content-Length: {len(body)}\r\n"
+				"Connection: close\r\n\r\n"
+			)
+			writer.write(response_head.encode("latin-1") + body)
+			await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			writer.close()
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(
+		description="Serve pseudo-random music over HTTP"
+	)
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument('-p', "--port", type=int, default=8000)
+	parser.add_argument('-w', "--workers", type=int)
+	parser.add_argument(
+		'-q', "--max-queued", type=int,
+		help="requests that may wait for a worker before new ones are refused"
+	)
+	server_args = parser.parse_args()
+
+	server = GenerationServer(
+		server_args.host, server_args.port, server_args.workers,
+		server_args.max_queued
+	)
+	try:
+		asyncio.run(server.serve_forever())
+	except KeyboardInterrupt:
+		pass
@@ -1,13 +1,64 @@
+from array import array
+import copy
 import itertools
 import logging
 import random
 import time
 
-from generate.voices.voice import Voice
+from generate.voices.voice import NoteSequence, Voice
 
 class Chorale(Voice):
 	"""A framework for chordal accompaniment"""
 
+	# bit n of a voice mask is set when voice n sounds
+	all_voices = 0b1111
+	# (note durations, voice masks) of each accompaniment rhythm
+	accompaniment_patterns = {
+		(2, 2): (
+			((960, 960), (all_voices, 0)),
+			((960 * 3 // 2, 480), (all_voices, 0)),
+			((480, 480, 480, 480), (all_voices, 0, all_voices, 0)),
+			(
+				(480, 240, 480, 240, 480),
+				(all_voices, 0, all_voices, 0, all_voices),
+			),
+		), (2, 3): (
+			((960, 960), (all_voices, 0)),
+			((960 * 10 // 6, 960 * 2 // 6), (all_voices, 0)),
+			(
+				(960 * 2 // 3, 320, 960 * 2 // 3, 320),
+				(all_voices, 0, all_voices, 0),
+			),
+		), (3, 2): (
+			((960, 960 * 2), (all_voices, 0)),
+			((960 * 2, 960), (all_voices, 0)),
+			(
+				(480, 480, 480, 480, 480, 480),
+				(all_voices, 0, all_voices, 0, all_voices, 0),
+			),
+		), (4, 2): (
+			((960, 960), (all_voices, 0)),
+			((960 * 3 // 2, 480), (all_voices, 0)),
+			((480, 480, 480, 480), (all_voices, 0, all_voices, 0)),
+			(
+				(480, 240, 480, 240, 480),
+				(all_voices, 0, all_voices, 0, all_voices),
+			), ((960 * 2, 960 * 2), (all_voices, 0)),
+		), (4, 3): (
+			((960, 960), (all_voices, 0)),
+			((960 * 10 // 6, 960 * 2 // 6), (all_voices, 0)),
+			(
+				(960 * 2 // 3, 320, 960 * 2 // 3, 320),
+				(all_voices, 0, all_voices, 0),
+			), ((960 * 2, 960 * 2), (all_voices, 0)),
+		),
+	}
+	# (time sig or "end", chord duration): compiled accompaniment templates
+	accompaniment_templates = {}
+	# chords voiced again on either side of a phrase boundary to join phrases
+	lead_out_length = 1
+	lead_in_length = 2
+
 	def __init__(self):
 		self.chord_index = 0
 		self.root_pitch = None
@@ -15,36 +66,10 @@ class Chorale(Voice):
 		self.time0 = 0
 		self.time1 = 0
 
-		self.bass_tenor_intervals = []
-		self.bass_alto_intervals = []
-		self.bass_soprano_intervals = []
-		self.tenor_alto_intervals = []
-		self.tenor_soprano_intervals = []
-		self.alto_soprano_intervals = []
-
-		self.bass_tenor_motion = []
-		self.bass_alto_motion = []
-		self.bass_soprano_motion = []
-		self.tenor_alto_motion = []
-		self.tenor_soprano_motion = []
-		self.alto_soprano_motion = []
-
-		self.composite_intervals = [
-			self.bass_tenor_intervals, self.bass_alto_intervals, 
-			self.bass_soprano_intervals, self.tenor_alto_intervals, 
-			self.tenor_soprano_intervals, self.alto_soprano_intervals,
-		]
-		self.composite_mvmts = [
-			self.bass_tenor_motion, self.bass_alto_motion, 
-			self.bass_soprano_motion, self.tenor_alto_motion, 
-			self.tenor_soprano_motion, self.alto_soprano_motion,
-		]
-
 		self.condensed_chords = []
 		self.unique_chord_indices = set()
-		self.chosen_chord_voicings = []
-		self.possible_chord_voicings = []
 		self.unsorted_pitch_combo_sequence = []
+		self.start_search(0, 0)
 
 		self.resolve_I6 = {"P5", "M3", "m3"}
 		self.resolve_I = {"M3", "m3"}
@@ -78,15 +103,102 @@ class Chorale(Voice):
 				)
 			previous_chord_obj = current_chord_obj
 
+	def get_phrase_starts(self):
+		"""Find the condensed chords that begin each phrase"""
+
+		phrase_starts = [0]
+		next_phrase_index = self.phrase_length
+		for condensed_index, chord_index in enumerate(sorted(self.unique_chord_indices)):
+			if chord_index < next_phrase_index:
+				continue
+			# a phrase no longer than its lead-in stays with the phrase before it
+			if condensed_index - phrase_starts[-1] > self.lead_in_length:
+				phrase_starts.append(condensed_index)
+			next_phrase_index = (
+				chord_index - chord_index % self.phrase_length + self.phrase_length
+			)
+
+		if (len(phrase_starts) > 1 and 
+		  len(self.condensed_chords) - phrase_starts[-1] <= self.lead_in_length):
+			phrase_starts.pop()
+		return phrase_starts
+
 	def make_chord_voicings(self):
-		"""Realize voice-leading of chord progression"""
+		"""Realize voice-leading of each phrase, then join the phrases"""
+
+		phrase_starts = self.get_phrase_starts()
+		phrase_ends = (*phrase_starts[1:], len(self.condensed_chords))
+		print(f"Phrase starts: {phrase_starts}")
 
+		self.time0 = time.time()
+		# the opening phrase places the bass of every other phrase
+		self.start_search(phrase_starts[0], phrase_ends[0])
+		if not self.search_phrase():
+			print("Harmony failed")
+			raise AssertionError
+
+		# later phrases don't depend on each other before they are joined,
+		# so a failure near one cadence never unwinds the other phrases
+		phrase_searches = []
+		for phrase_start, phrase_end in zip(phrase_starts[1:], phrase_ends[1:]):
+			# a shallow copy shares the chords but keeps its own search
+			phrase_search = copy.copy(self)
+			phrase_search.start_search(phrase_start, phrase_end)
+			if not phrase_search.search_phrase():
+				print("Harmony failed")
+				raise AssertionError
+			phrase_searches.append(phrase_search)
+
+		for phrase_search in phrase_searches:
+			self.join_phrase(phrase_search)
+
+	def start_search(self, phrase_start, phrase_end):
+		"""Clear the voice-leading search before voicing a phrase"""
+
+		self.chord_index = phrase_start
+		self.phrase_start = phrase_start
+		self.phrase_end = phrase_end
 		self.chosen_chord_voicings = [None for _ in self.condensed_chords]
 		self.possible_chord_voicings = [None for _ in self.condensed_chords]
-		self.possible_chord_voicings[self.chord_index] = self.populate_chord()
+		self.pinned_voicings = {}
 
-		self.time0 = time.time()
-		while None in self.chosen_chord_voicings:
+		self.bass_tenor_intervals = []
+		self.bass_alto_intervals = []
+		self.bass_soprano_intervals = []
+		self.tenor_alto_intervals = []
+		self.tenor_soprano_intervals = []
+		self.alto_soprano_intervals = []
+
+		self.bass_motion = []
+		self.tenor_motion = []
+		self.alto_motion = []
+		self.soprano_motion = []
+
+		self.bass_tenor_motion = []
+		self.bass_alto_motion = []
+		self.bass_soprano_motion = []
+		self.tenor_alto_motion = []
+		self.tenor_soprano_motion = []
+		self.alto_soprano_motion = []
+
+		self.composite_intervals = [
+			self.bass_tenor_intervals, self.bass_alto_intervals, 
+			self.bass_soprano_intervals, self.tenor_alto_intervals, 
+			self.tenor_soprano_intervals, self.alto_soprano_intervals,
+		]
+		self.composite_mvmts = [
+			self.bass_tenor_motion, self.bass_alto_motion, 
+			self.bass_soprano_motion, self.tenor_alto_motion, 
+			self.tenor_soprano_motion, self.alto_soprano_motion,
+		]
+
+	def search_phrase(self):
+		"""Voice the rest of the phrase, returning False once no voicing is left"""
+
+		if self.possible_chord_voicings[self.chord_index] is None:
+			self.possible_chord_voicings[self.chord_index] = self.populate_chord()
+
+		while self.chord_index < self.phrase_end:
 			self.combo_choice = next(
 				self.possible_chord_voicings[self.chord_index], None
 			)
@@ -99,9 +211,8 @@ class Chorale(Voice):
 				# not useful to negative track because ≈ 10^21 combinations
 				# means most cases are solved within a few seconds or
 				# have a very long wait time
-				if self.chord_index <= 0:
-					print("Harmony failed")
-					raise AssertionError
+				if self.chord_index <= self.phrase_start:
+					return False
 
 				self.time1 = time.time()
 				if self.time1 - self.time0 > 15:
@@ -114,11 +225,45 @@ class Chorale(Voice):
 			else:
 				self.chosen_chord_voicings[self.chord_index] = self.combo_choice
 				self.chord_index += 1
-				if self.chord_index < len(self.chosen_chord_voicings):
+				if self.chord_index < self.phrase_end:
 					self.possible_chord_voicings[self.chord_index] = (
 						self.populate_chord()
 					)
 
+		return True
+
+	def rewind_search(self, chord_index):
+		"""Undo voicings back to a chord, which then tries its next voicing"""
+
+		while self.chord_index > chord_index:
+			self.chord_index -= 1
+			self.erase_last_chord()
+			self.chosen_chord_voicings[self.chord_index] = None
+
+	def join_phrase(self, phrase_search):
+		"""Continue the voice-leading into a phrase that was solved on its own"""
+
+		lead_in_end = phrase_search.phrase_start + self.lead_in_length
+		self.rewind_search(phrase_search.phrase_start - self.lead_out_length)
+		self.possible_chord_voicings[self.chord_index] = None
+		self.phrase_start = self.chord_index
+		self.phrase_end = phrase_search.phrase_end
+		while True:
+			# the rest of the phrase is checked again but keeps its voicings
+			self.pinned_voicings = {
+				chord_index: phrase_search.chosen_chord_voicings[chord_index]
+				for chord_index in range(lead_in_end, self.phrase_end)
+			}
+			if self.search_phrase():
+				return
+
+			# voice-leading rules look two chords back, so only the first
+			# two chords after the lead-in can keep the phrase from joining
+			phrase_search.rewind_search(min(lead_in_end + 1, self.phrase_end - 1))
+			if not phrase_search.search_phrase():
+				print("Harmony failed")
+				raise AssertionError
+
 	def erase_last_chord(self):
 		"""Remove last validated chord instance"""
 
@@ -142,7 +287,7 @@ class Chorale(Voice):
 		current_chord = current_chord_obj.chord_name
 		chord_direction = str(current_chord_obj)[0]
 
-		if self.chord_index > 0:
+		if self.previous_voicing is not None:
 			previous_chord_obj = self.condensed_chords[self.chord_index - 1]
 			previous_chord = previous_chord_obj.chord_name
 			previous_pitches_dict = previous_chord_obj.pitches_to_degrees
@@ -155,10 +300,15 @@ class Chorale(Voice):
 			previous_degree_combo = None
 			previous_chord_members = None
 
+		if self.chord_index in self.pinned_voicings:
+			pitch_combos = (self.pinned_voicings[self.chord_index],)
+		else:
+			pitch_combos = self.arrange_pitch_combos(
+				unsorted_pitch_combos, current_chord_members, current_pitches_dict
+			)
 		# generator requires passing of parameters to prevent side effects
 		# from backtracking
-		for pitch_combo in self.arrange_pitch_combos(
-		  unsorted_pitch_combos, current_chord_members, current_pitches_dict):
+		for pitch_combo in pitch_combos:
 			if self.is_voice_lead(
 			  pitch_combo, current_chord, previous_chord, chord_direction, 
 			  current_pitches_dict, previous_degree_combo, 
@@ -179,7 +329,7 @@ class Chorale(Voice):
 			if scale_degree_count > 1:
 				voicing_groups[scale_degree_count - 1].append(pitch_combo)
 
-		if self.chord_index == 0:
+		if self.previous_voicing is None:
 			for voicing_group in reversed(voicing_groups):
 				random.shuffle(voicing_group)
 				for pitch_combo in voicing_group:
@@ -209,6 +359,13 @@ class Chorale(Voice):
 
 		return sorted_voicing_group
 
+	@property
+	def previous_voicing(self):
+		"""The voicing that the current chord leads from, if any"""
+		if self.chord_index == 0:
+			return None
+		return self.chosen_chord_voicings[self.chord_index - 1]
+
 	@property
 	def octave_above(self):
 		return range(self.root_pitch, self.root_pitch + 12)
@@ -254,8 +411,18 @@ class Chorale(Voice):
 			self.get_interval(a_pitch, s_pitch, current_pitches_dict)
 		)
 
-		if self.chord_index == 0:
-			if bass_soprano_intervals[-1] not in {"P5", "P8", "M3", "m3"}:
+		if self.chord_index > 0:
+			if chord_direction == "+" and b_pitch not in self.octave_above:
+				return False
+			elif chord_direction == "-" and b_pitch not in self.octave_below:
+				return False
+			elif chord_direction == "0" and b_pitch != self.root_pitch:
+				return False
+
+		# a phrase solved on its own opens without a voicing to lead from
+		if self.previous_voicing is None:
+			if (self.chord_index == 0 and 
+			  bass_soprano_intervals[-1] not in {"P5", "P8", "M3", "m3"}):
 				return False
 			self.bass_tenor_intervals.append(bass_tenor_intervals[-1]) 
 			self.bass_alto_intervals.append(bass_alto_intervals[-1]) 
@@ -264,16 +431,10 @@ class Chorale(Voice):
 			self.tenor_soprano_intervals.append(tenor_soprano_intervals[-1]) 
 			self.alto_soprano_intervals.append(alto_soprano_intervals[-1])
 
-			self.root_pitch = b_pitch 
+			if self.chord_index == 0:
+				self.root_pitch = b_pitch 
 			return True
 
-		if chord_direction == "+" and b_pitch not in self.octave_above:
-			return False
-		elif chord_direction == "-" and b_pitch not in self.octave_below:
-			return False
-		elif chord_direction == "0" and b_pitch != self.root_pitch:
-			return False
-
 		bass_motion = self.bass_motion[:]
 		tenor_motion = self.tenor_motion[:]
 		alto_motion = self.alto_motion[:]
@@ -297,6 +458,7 @@ class Chorale(Voice):
 			if abs(new_pitch - old_pitch) > 12:
 				return False
 			if (self.chord_index > 1 and
+			  self.chosen_chord_voicings[self.chord_index - 2] is not None and
 			  abs(old_pitch - self.chosen_chord_voicings[self.chord_index - 2][voice_index + 1]) > 5 
 			  and (abs(new_pitch - old_pitch) > 2 or
 			  composite_motion[voice_index][-1] == 
@@ -442,156 +604,126 @@ class Chorale(Voice):
 
 		if Voice.pickup:
 			for _ in range(4):
-				Voice.midi_score.append([Voice.Note("Rest", 0, Voice.pickup_duration)])
+				Voice.midi_score.append(
+					NoteSequence([Voice.Note(Voice.rest_pitch, 0, Voice.pickup_duration)])
+				)
 				Voice.chorale_scale_degrees.append([None])
 		else:
 			for _ in range(4):
-				Voice.midi_score.append([])
+				Voice.midi_score.append(NoteSequence())
 				Voice.chorale_scale_degrees.append([])
 
-		chord_accompaniments = {
-			(2,2): [
-				((960, 960), ({0, 1, 2, 3}, {})),
-				((960 * 3 // 2, 480), ({0, 1, 2, 3}, {})),
-				((480, 480, 480, 480), ({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {})),
-				(
-					(480, 240, 480, 240, 480), 
-					({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {}, {0, 1, 2, 3}),
-				),
-			], (2,3): [
-				((960, 960), ({0, 1, 2, 3}, {})),
-				((960 * 10 // 6, 960 * 2 // 6), ({0, 1, 2, 3}, {})), 
-				(
-					(960 * 2 // 3, 320, 960 * 2 // 3, 320), 
-					({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {}),
-				),
-			], (3,2): [
-				((960, 960 * 2), ({0, 1, 2, 3}, {})),
-				((960 * 2, 960), ({0, 1, 2, 3}, {})),
-				(
-					(480, 480, 480, 480, 480, 480), 
-					({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {}, {0, 1, 2, 3}, {}),
-				),
-			], (4,2): [
-				((960, 960), ({0, 1, 2, 3}, {})),
-				((960 * 3 // 2, 480), ({0, 1, 2, 3}, {})),
-				((480, 480, 480, 480), ({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {})),
-				(
-					(480, 240, 480, 240, 480), 
-					({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {}, {0, 1, 2, 3}),
-				), ((960 * 2, 960 * 2), ({0, 1, 2, 3}, {})),
-			], (4,3): [
-				((960, 960), ({0, 1, 2, 3}, {})),
-				((960 * 10 // 6, 960 * 2 // 6), ({0, 1, 2, 3}, {})), 
-				(
-					(960 * 2 // 3, 320, 960 * 2 // 3, 320), 
-					({0, 1, 2, 3}, {}, {0, 1, 2, 3}, {}),
-				), ((960 * 2, 960 * 2), ({0, 1, 2, 3}, {}))
-			]
-		}
-
-		chord_accompaniment = chord_accompaniments[Voice.time_sig]
-
-		if Voice.time_sig[0] == 4:
-			if Voice.chord_acceleration:
-				chord_accompaniment.pop()
-
-		note_durations, voices_used = random.choice(chord_accompaniment)
-
-		chord_units_used = sum(note_durations) // Voice.max_note_duration
-		if chord_units_used == 0:
-			chord_units_used = 1
-		print(f"Chord units used: {chord_units_used}")
-		all_note_durations = [] 
-		all_voices_used = []
-		note_index = 0
-		for _ in range(chord_units_used):
-			all_note_durations.append([])
-			all_voices_used.append([])
-			while sum(all_note_durations[-1]) < Voice.max_note_duration:
-				all_note_durations[-1].append(note_durations[note_index])
-				all_voices_used[-1].append(voices_used[note_index])
-				note_index += 1
+		accompaniment_templates = self.get_accompaniment_templates(
+			Voice.time_sig, Voice.max_note_duration
+		)
+		# the rhythm spanning two chords is left out when chords accelerate
+		if Voice.time_sig[0] == 4 and Voice.chord_acceleration:
+			accompaniment_templates = accompaniment_templates[:-1]
+
+		accompaniment_template = random.choice(accompaniment_templates)
+		print(f"Chord units used: {len(accompaniment_template)}")
+		print(
+			"All note durations: "
+			f"{[list(note_durations) for _, note_durations, _ in accompaniment_template]}"
+		)
 
-		print(f"All note durations: {all_note_durations}")
-		print(f"All voices used: {all_voices_used}")
 		num_chords = len(Voice.chord_sequence)
 		self.current_time = Voice.pickup_duration
-		self.add_chord_section(
-			0, -2, all_note_durations, all_voices_used, chord_units_used
-		)
+		self.add_chord_section(0, -2, accompaniment_template)
 
-		end_note_durations = (
-			(Voice.max_note_duration,), (Voice.max_note_duration,)
-		)
-		end_voices_used = [[{0, 1, 2, 3}], [{}]]
+		end_template = self.get_end_template(Voice.max_note_duration)
 
 		if self.repeat_ending:
 			self.add_chord_section(
-				-2 % num_chords, num_chords, all_note_durations, 
-				all_voices_used, chord_units_used
+				-2 % num_chords, num_chords, accompaniment_template
 			)
-			self.add_chord_section(
-				-4 % num_chords, -2, all_note_durations, all_voices_used, 
-				chord_units_used
+			self.add_chord_section(-4 % num_chords, -2, accompaniment_template)
+
+		self.add_chord_section(-2 % num_chords, num_chords, end_template)
+
+	@classmethod
+	def get_accompaniment_templates(cls, time_sig, chord_duration):
+		"""Compile the accompaniment patterns of a time signature once"""
+		template_key = (time_sig, chord_duration)
+		if template_key not in cls.accompaniment_templates:
+			cls.accompaniment_templates[template_key] = tuple(
+				cls.compile_accompaniment(note_durations, voice_masks, chord_duration)
+				for note_durations, voice_masks in cls.accompaniment_patterns[time_sig]
 			)
 
-		self.add_chord_section(
-			-2 % num_chords, num_chords, end_note_durations, 
-			end_voices_used, 2
-		)
+		return cls.accompaniment_templates[template_key]
 
-	def add_chord_section(
-	  self, start_index, end_index, all_note_durations, all_voices_used,
-	  chord_units_used):
+	@classmethod
+	def get_end_template(cls, chord_duration):
+		"""Compile the final chord and the rest after it once"""
+		template_key = ("end", chord_duration)
+		if template_key not in cls.accompaniment_templates:
+			cls.accompaniment_templates[template_key] = cls.compile_accompaniment(
+				(chord_duration, chord_duration), (cls.all_voices, 0), chord_duration
+			)
+
+		return cls.accompaniment_templates[template_key]
+
+	@staticmethod
+	def compile_accompaniment(note_durations, voice_masks, chord_duration):
+		"""Split an accompaniment pattern into (offset, duration, voice mask)
+		arrays for each chord it spans"""
+
+		chord_units_used = sum(note_durations) // chord_duration
+		if chord_units_used == 0:
+			chord_units_used = 1
+		accompaniment_template = []
+		note_index = 0
+		for _ in range(chord_units_used):
+			note_offsets = array('i')
+			chord_note_durations = array('i')
+			chord_voice_masks = array('B')
+			note_offset = 0
+			while note_offset < chord_duration:
+				note_offsets.append(note_offset)
+				chord_note_durations.append(note_durations[note_index])
+				chord_voice_masks.append(voice_masks[note_index])
+				note_offset += note_durations[note_index]
+				note_index += 1
+			accompaniment_template.append(
+				(note_offsets, chord_note_durations, chord_voice_masks)
+			)
+
+		return tuple(accompaniment_template)
+
+	def add_chord_section(self, start_index, end_index, accompaniment_template):
 		"""Extend accompaniment with selected chords"""
 
 		unique_chord_iter = iter(self.chosen_chord_voicings)
 		chord_sequence = Voice.chord_sequence[:end_index]
+		chord_units_used = len(accompaniment_template)
 
 		for chord_index, current_chord_obj in enumerate(chord_sequence):
+			# repeated chords keep the voicing of the previous chord
+			if chord_index in self.unique_chord_indices:
+				current_pitch_combo = next(unique_chord_iter)
 			if chord_index < start_index:
-				if chord_index in self.unique_chord_indices:
-					current_pitch_combo = next(unique_chord_iter)
-					last_pitch_combo = current_pitch_combo
 				continue
 
 			pitches_to_degrees = current_chord_obj.pitches_to_degrees
-			note_durations = all_note_durations[chord_index % chord_units_used]
-			voices_used = all_voices_used[chord_index % chord_units_used]
-
-			if chord_index in self.unique_chord_indices:
-				current_pitch_combo = next(unique_chord_iter)
-				last_pitch_combo = current_pitch_combo
-
-				for voice_index, current_pitch in enumerate(current_pitch_combo):
-					note_time = self.current_time
-					for beat_index, note_duration in enumerate(note_durations):
-						if voice_index in voices_used[beat_index]:
-							Voice.midi_score[voice_index + 1].append(
-								Voice.Note(current_pitch, note_time, note_duration))
-							Voice.chorale_scale_degrees[voice_index].append(
-								pitches_to_degrees[current_pitch])
-						else:
-							Voice.midi_score[voice_index + 1].append(
-								Voice.Note("Rest", note_time, note_duration))
-							Voice.chorale_scale_degrees[voice_index].append(None)
-						note_time += note_duration
-			else:
-				for voice_index, last_pitch in enumerate(last_pitch_combo):
-					note_time = self.current_time
-
-					for beat_index, note_duration in enumerate(note_durations):
-						if voice_index in voices_used[beat_index]:
-							Voice.midi_score[voice_index + 1].append(
-								Voice.Note(last_pitch, note_time, note_duration))
-							Voice.chorale_scale_degrees[voice_index].append(
-								pitches_to_degrees[last_pitch])
-						else:
-							Voice.midi_score[voice_index + 1].append(
-								Voice.Note("Rest", note_time, note_duration))
-							Voice.chorale_scale_degrees[voice_index].append(None)
-						note_time += note_duration
+			note_offsets, note_durations, voice_masks = (
+				accompaniment_template[chord_index % chord_units_used]
+			)
+			# every voice shares the note times of a chord
+			note_times = array('i', map(self.current_time.__add__, note_offsets))
+			for voice_index, current_pitch in enumerate(current_pitch_combo):
+				voice_bit = 1 << voice_index
+				Voice.midi_score[voice_index + 1].stamp(
+					[
+						current_pitch if voice_mask & voice_bit else Voice.rest_pitch
+						for voice_mask in voice_masks
+					], note_times, note_durations
+				)
+				current_degree = pitches_to_degrees[current_pitch]
+				Voice.chorale_scale_degrees[voice_index].extend(
+					current_degree if voice_mask & voice_bit else None
+					for voice_mask in voice_masks
+				)
 
 			self.current_time += Voice.max_note_duration
 
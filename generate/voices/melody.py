@@ -1,3 +1,4 @@
+import collections
 from fractions import Fraction
 import itertools
 import logging
@@ -7,37 +8,71 @@ import time
 from generate.idioms.chord import Chord
 from generate.idioms.progression import Progression
 from generate.idioms.score import Score
-from generate.voices.voice import Voice
+from generate.voices.voice import NoteSequence, Voice
+
+def make_phrase_rhythms(rhythm_patterns):
+	"""Split the weighted patterns of each phrase into choices and cumulative weights"""
+	return tuple(
+		(
+			tuple(pattern for pattern, _ in phrase_options),
+			tuple(itertools.accumulate(weight for _, weight in phrase_options)),
+		) for phrase_options in rhythm_patterns
+	)
+
 
 class Melody(Voice):
 	"""A chord-based melody builder"""
 
+	# the chords and melody found for one period of the form
+	Period = collections.namedtuple("Period", [
+		"chords", "chord_acceleration", "rhythm_symbols", "finalized_rhythms",
+		"nested_scale_degrees", "unnested_scale_degrees", "chosen_figurations",
+	])
+
+	phrase_rhythms = make_phrase_rhythms(Score.rhythm_patterns)
+	# rhythm symbol: possible note durations within a chord
+	simple_rhythms = {
+		-1: ((8,),), 0: ((4, 4), (6, 2)), 1: ((4, 4), (6, 2)),
+		2: ((3, 3, 2), (4, 2, 2), (6, 1, 1)), -2: ((4, 4), (6, 2)),
+	}
+	compound_rhythms = {
+		-1: ((12,),), 0: ((6, 6), (10, 2)), 1: ((6, 6), (6, 2, 4), (10, 2)),
+		2: (
+			(4, 2, 6), (4, 4, 4), (6, 6), (6, 2, 4), (6, 4, 2), (8, 4), 
+			(10, 1, 1), (10, 2)
+		), -2: ((6, 6), (10, 2)),
+	}
+	triple_rhythms = {
+		-1: ((12,),), 0: ((8, 2, 2), (8, 4), (10, 2), (6, 2, 4)),
+		1: ((4, 4, 4), (6, 2, 4), (8, 2, 2), (8, 4), (10, 2)),
+		2: (
+			(4, 2, 6), (4, 4, 4), (6, 6), (6, 2, 4), (8, 2, 2), (10, 1, 1), 
+			(10, 2), (8, 4)
+		), -2: ((8, 4), (10, 2)),
+	}
+	# shared by every piece, so the catalogue is never modified
+	rhythm_catalogue = {
+		(2, 2): simple_rhythms, (4, 2): simple_rhythms, (2, 3): compound_rhythms,
+		(4, 3): compound_rhythms, (3, 2): triple_rhythms,
+	}
+
 	def __init__(self):
 
 		Melody.create_logger()
 
-		#reset, incase of failed melody
-		Chord.reset_settings()
 		self.progression_obj = Progression()
 		print(f"{self.tonic} {self.mode}")
 		print(f"{self.measure_length} beats divided by {self.beat_division}")
 
+		# chord indices within a period
 		self.quick_turn_indices = {2, 5, 6, 9, 10, 13}
 		self.good_double_rest_indices = {3, 7}
 		self.bad_single_rest_indices = {6, 10, 14}
 		self.valid_leap_indices = {4, 8}
 
-		self.rhythm_symbols = [None for _ in range(16)]
-		self.finalized_rhythms = {}
-		self.nested_scale_degrees = [[] for _ in range(16)]
-		self.unnested_scale_degrees = []
-		self.midi_notes = []
-
-		self.melodic_direction = [None for _ in range(16)]
-		self.chosen_scale_degrees = [None for _ in range(16)]
-		self.current_scale_degree_options = [[] for _ in range(16)]
-		self.melody_figure_options = [[] for _ in range(15)]
-		self.all_scale_degree_options = []
+		self.periods = {}
+		self.start_period()
+		self.midi_notes = NoteSequence()
 
 		self.break_notes = random.choice((True, False))
 		print(f"Repeat ending: {self.repeat_ending}")
@@ -45,7 +80,6 @@ class Melody(Voice):
 		self.melody_range = []
 		self.unit_length = 0
 		self.current_time = 0
-		self.chord_index = 0
 		self.pickup_rhythm = []
 
 		self.time0 = 0
@@ -57,7 +91,6 @@ class Melody(Voice):
 				3: ((-1,), (0,)),
 			}
 		}
-		self.chosen_figurations = [None for _ in range(15)]
 
 		self.all_single_figurations = {
 			0: lambda previous, current, slope: [
@@ -124,9 +157,7 @@ class Melody(Voice):
 	def make_melody(self):
 		"""Make a random melody"""
 		self.set_scale_midi_pitches()
-		self.make_chord_progression()
-		self.create_rhythm()
-		self.realize_melody()
+		self.make_form()
 
 		self.add_midi_score()
 		self.prepare_score()
@@ -135,6 +166,79 @@ class Melody(Voice):
 		self.make_lily_part()
 		Voice.midi_score.append(self.midi_notes)
 
+	def start_period(self):
+		"""Clear the melody search for the next period"""
+		self.period_chords = []
+		self.chord_index = 0
+
+		self.rhythm_symbols = [None for _ in range(self.period_length)]
+		self.finalized_rhythms = {}
+		self.nested_scale_degrees = [[] for _ in range(self.period_length)]
+		self.unnested_scale_degrees = []
+
+		self.melodic_direction = [None for _ in range(self.period_length)]
+		self.chosen_scale_degrees = [None for _ in range(self.period_length)]
+		self.current_scale_degree_options = [[] for _ in range(self.period_length)]
+		self.melody_figure_options = [[] for _ in range(self.period_length - 1)]
+		self.all_scale_degree_options = []
+		self.chosen_figurations = [None for _ in range(self.period_length - 1)]
+
+	def make_period(self):
+		"""Make the chords, rhythm and melody of a single period"""
+		self.start_period()
+		self.progression_obj.start_period()
+		self.make_chord_progression()
+		self.create_rhythm()
+		self.realize_melody()
+
+		return self.Period(
+			self.period_chords, Voice.chord_acceleration, self.rhythm_symbols,
+			self.finalized_rhythms, self.nested_scale_degrees,
+			self.unnested_scale_degrees, self.chosen_figurations,
+		)
+
+	def make_form(self):
+		"""Join separately searched periods into the form of the piece"""
+		print(f"Form: {self.form}")
+		# repeated periods reuse the melody found the first time
+		for period_label in self.form:
+			while period_label not in self.periods:
+				try:
+					self.periods[period_label] = self.make_period()
+				except AssertionError:
+					# nothing is kept yet, so the whole piece restarts
+					if not self.periods:
+						raise
+					print("Restarting period...")
+
+		form_periods = [self.periods[period_label] for period_label in self.form]
+		Voice.chord_sequence = [
+			chord_obj for period in form_periods for chord_obj in period.chords
+		]
+		Voice.chord_acceleration = any(
+			period.chord_acceleration for period in form_periods
+		)
+		self.rhythm_symbols = [
+			rhythm_symbol for period in form_periods
+			for rhythm_symbol in period.rhythm_symbols
+		]
+		self.finalized_rhythms = [
+			rhythm for period in form_periods for rhythm in period.finalized_rhythms
+		]
+		self.nested_scale_degrees = [
+			melody_group for period in form_periods
+			for melody_group in period.nested_scale_degrees
+		]
+		self.chosen_figurations = [
+			fig_type for period in form_periods
+			for fig_type in period.chosen_figurations
+		]
+		# the final chord of the last period is left out of its melody
+		self.unnested_scale_degrees = Voice.merge_lists(
+			*self.nested_scale_degrees[:-self.period_length],
+			form_periods[-1].unnested_scale_degrees,
+		)
+
 	def set_scale_midi_pitches(self):
 		"""Choose all midi pitches that are diatonic to the key signature"""
 		current_pitch = -12
@@ -169,12 +273,12 @@ class Melody(Voice):
 		for chord_pattern in chord_structure:
 			chord_seq_choice = self.progression_obj.add_chord_pattern(chord_pattern)
 			if isinstance(chord_seq_choice, str):
-				Voice.chord_sequence.append(Chord(chord_seq_choice))
+				self.period_chords.append(Chord(chord_seq_choice, self.tonic, self.mode))
 			elif isinstance(chord_seq_choice, list):
 				for chord_choice in chord_seq_choice:
-					Voice.chord_sequence.append(Chord(chord_choice))
+					self.period_chords.append(Chord(chord_choice, self.tonic, self.mode))
 
-		print(f"Chord sequence: {Voice.chord_sequence}")
+		print(f"Chord sequence: {self.period_chords}")
 		if temp_mode is not None:
 			Score.mode = temp_mode
 
@@ -182,8 +286,10 @@ class Melody(Voice):
 		"""Choose a rhythm for the melody with basic/contrasting ideas"""
 
 		raw_rhythm_symbols = []
-		for phrase_options in self.rhythm_patterns:
-			raw_rhythm_symbols.extend(random.choice(phrase_options))
+		for phrase_patterns, cum_weights in self.phrase_rhythms:
+			raw_rhythm_symbols.extend(
+				random.choices(phrase_patterns, cum_weights=cum_weights)[0]
+			)
 		if 2 in raw_rhythm_symbols and 1 not in raw_rhythm_symbols:
 			for index, rhythm_num in enumerate(raw_rhythm_symbols):
 				if rhythm_num > 0:
@@ -194,44 +300,24 @@ class Melody(Voice):
 			self.rhythm_symbols = raw_rhythm_symbols
 		print(f"Rhythm symbols: {self.rhythm_symbols}")
 
-		if self.time_sig in {(2, 2), (4, 2)}:
-			rhythm_mapping = {
-				-1: [(8,)], 0: [(4, 4), (6, 2)], 1: [(4, 4), (6, 2)], 
-				2:[(3, 3, 2), (4, 2, 2), (6, 1, 1)],
-				-2: [(4, 4), (6, 2)],
-			}
-		elif self.time_sig in {(2, 3), (4, 3)}:
-			rhythm_mapping = {
-				-1: [(12,)], 0: [(6, 6), (10, 2)], 
-				1: [(6, 6), (6, 2, 4), (10, 2)], 
-				2: [
-					(4, 2, 6), (4, 4, 4), (6, 6), (6, 2, 4), (6, 4, 2), 
-					(8, 4), (10, 1, 1), (10, 2)
-				], -2: [(6, 6), (10, 2)],
-			}
-		elif self.time_sig == (3, 2):
-			rhythm_mapping = {
-				-1: [(12,)], 0: [(8, 2, 2), (8, 4), (10, 2), (6, 2, 4)], 
-				1: [(4, 4, 4), (6, 2, 4), (8, 2, 2), (8, 4), (10, 2)], 
-				2:[
-					(4, 2, 6), (4, 4, 4), (6, 6), (6, 2, 4), (8, 2, 2), 
-					(10, 1, 1), (10, 2), (8, 4)
-				], -2: [(8, 4), (10, 2)],
-			}
-
+		rhythm_mapping = self.rhythm_catalogue[self.time_sig]
 		chosen_rhythms = {}
 		rhythm_symbol_set = set(self.rhythm_symbols)
-		if -2 in rhythm_symbol_set:
+		# only the opening period can begin the piece with a pickup
+		if -2 in rhythm_symbol_set and not self.periods:
 			Voice.pickup = True
 		print(f"Pickup note? {Voice.pickup}")
 		for rhythm_symbol in rhythm_symbol_set:
 			possible_rhythms = rhythm_mapping[rhythm_symbol]
-			random.shuffle(possible_rhythms)
-			while True:
-				chosen_rhythm = possible_rhythms.pop()
+			# sampled without replacement through a permutation of indices
+			for rhythm_index in random.sample(
+			  range(len(possible_rhythms)), len(possible_rhythms)):
+				chosen_rhythm = possible_rhythms[rhythm_index]
 				if chosen_rhythm not in chosen_rhythms.values() or rhythm_symbol == -2:
 					chosen_rhythms[rhythm_symbol] = chosen_rhythm
 					break
+			else:
+				raise AssertionError
 
 		print(f"Chosen rhythms: {chosen_rhythms}")
 
@@ -249,10 +335,10 @@ class Melody(Voice):
 
 		phrase2_start_index = 4
 		phrase4_start_index = 12
-		if str(Voice.chord_sequence[0]) == "0I":
+		if str(self.period_chords[0]) == "0I":
 			self.all_scale_degree_options.append([0, 2])
 		# separate first note to allow irregular starts e.g., major 2nd
-		for chord_index, chord_obj in enumerate(Voice.chord_sequence[1:-2], 1):
+		for chord_index, chord_obj in enumerate(self.period_chords[1:-2], 1):
 			current_scale_degrees = chord_obj.scale_degrees
 			# make into set?
 			self.all_scale_degree_options.append([])
@@ -452,7 +538,7 @@ class Melody(Voice):
 			  self.nested_scale_degrees[0] != self.nested_scale_degrees[8]):
 				return False 
 
-		# score divides into 4 sections, 16 items
+		# period divides into 4 sections, 16 items
 		# first 2 sections: antecedent
 		# last 2 sections: consequent
 		current_section = self.chord_index // 4
@@ -541,7 +627,9 @@ class Melody(Voice):
 			return True
 		if last_rhythm_symbol == -2:
 			self.melody_figure_options[self.chord_index - 1] = (
-				self.get_pickup_sequences(self.current_degree_choice)
+				self.get_pickup_sequences(
+					self.current_degree_choice, self.period_chords[self.chord_index]
+				)
 			)
 			return self.add_valid_figure()
 
@@ -643,7 +731,7 @@ class Melody(Voice):
 
 		if not self.repeat_ending:
 			self.midi_notes.append(
-				Voice.Note("Rest", self.current_time, Voice.max_note_duration))
+				Voice.Note(Voice.rest_pitch, self.current_time, Voice.max_note_duration))
 			self.current_time += Voice.max_note_duration
 			return
 
@@ -657,7 +745,7 @@ class Melody(Voice):
 
 		ending_duration = Voice.max_note_duration - second_pickup_duration
 		self.midi_notes.append(
-			Voice.Note("Rest", self.current_time, ending_duration)
+			Voice.Note(Voice.rest_pitch, self.current_time, ending_duration)
 		)
 
 		self.current_time += ending_duration
@@ -671,7 +759,7 @@ class Melody(Voice):
 		)
 
 		self.midi_notes.append(
-			Voice.Note("Rest", self.current_time, Voice.max_note_duration)
+			Voice.Note(Voice.rest_pitch, self.current_time, Voice.max_note_duration)
 		)
 		self.current_time += Voice.max_note_duration
 
@@ -679,6 +767,7 @@ class Melody(Voice):
 		"""Adds pickup notes to beginning of the piece"""
 
 		rest_rhythm = self.finalized_rhythms[7][0]
+		self.pickup_rhythm = self.finalized_rhythms[7][1:]
 		Voice.pickup_duration = Voice.max_note_duration
 		first_scale_degree = self.unnested_scale_degrees[0]
 
@@ -688,11 +777,10 @@ class Melody(Voice):
 			numerator=rest_rhythm, denominator=self.unit_length
 		)
 		rest_duration = int(Voice.pickup_duration * rest_fraction)
-		self.midi_notes.append(Voice.Note("Rest", 0, rest_duration))
+		self.midi_notes.append(Voice.Note(Voice.rest_pitch, 0, rest_duration))
 
-		self.chord_index = 0
 		pickup_degree_sequence, _ = random.choice(
-			self.get_pickup_sequences(first_scale_degree)
+			self.get_pickup_sequences(first_scale_degree, Voice.chord_sequence[0])
 		)
 		current_time = rest_duration
 
@@ -718,10 +806,10 @@ class Melody(Voice):
 
 		return len(self.pickup_rhythm)
 
-	def get_pickup_sequences(self, centered_degree):
+	def get_pickup_sequences(self, centered_degree, chord_obj):
 		"""Create pickup sequences using a reference scale degree"""
 
-		possible_degrees = Voice.chord_sequence[self.chord_index].scale_degrees
+		possible_degrees = chord_obj.scale_degrees
 		degree_index = possible_degrees.index(centered_degree % 7)
 		chord_pickup_choices = self.pickup_figurations[len(self.pickup_rhythm)]
 		possible_scale_shifts = chord_pickup_choices[degree_index]
@@ -801,9 +889,13 @@ class Melody(Voice):
 					fixed_note_duration = raw_note_duration
 
 				midi_pitch = self.melody_range[scale_degree + 3] + note_offset
-				if chord_index == 7 and embellish_index == 0 and self.rhythm_symbols[6] == -1:
+				period_index = chord_index % self.period_length
+				# the melody rests between phrases and after each inner period
+				if embellish_index == 0 and (
+				  period_index == 7 and self.rhythm_symbols[chord_index - 1] == -1 or
+				  period_index == self.period_length - 1):
 					self.midi_notes.append(
-						Voice.Note("Rest", self.current_time, fixed_note_duration)
+						Voice.Note(Voice.rest_pitch, self.current_time, fixed_note_duration)
 					)
 					# needed all numbers in unnested sequence for validation
 					self.unnested_scale_degrees.pop(object_index + index_shift)
@@ -813,7 +905,7 @@ class Melody(Voice):
 					)
 					if add_rest:
 						self.midi_notes.append(
-							Voice.Note("Rest", self.current_time + 960, extra_duration)
+							Voice.Note(Voice.rest_pitch, self.current_time + 960, extra_duration)
 						)
 
 				self.current_time += raw_note_duration
@@ -825,8 +917,9 @@ class Melody(Voice):
 	def prepare_score(self):
 		self.add_rest_placeholders()
 		if self.mode not in ("ionian", "aeolian"):
-			Chord.reset_settings()
-			Voice.chord_sequence = (Chord("0I"),) * 16
+			Voice.chord_sequence = (
+				(Chord("0I", self.tonic, self.mode),) * len(Voice.chord_sequence)
+			)
 
 	def add_rest_placeholders(self):
 		"""Modify scale degree sequence to match midi note sequence"""
@@ -834,8 +927,8 @@ class Melody(Voice):
 		unnested_scale_degrees = []
 		unnested_melody_iter = iter(self.unnested_scale_degrees)
 
-		for midi_note in self.midi_notes:
-			if midi_note.pitch == "Rest":
+		for midi_pitch in self.midi_notes.pitches:
+			if midi_pitch == Voice.rest_pitch:
 				unnested_scale_degrees.append(None)
 
 			else:
@@ -1,9 +1,92 @@
+from array import array
 import collections
 from fractions import Fraction
 import itertools
 
 from generate.idioms.score import Score
 
+def make_lily_pitches(note_names):
+	"""Map every spelling of every midi pitch to lilypond notation"""
+	lily_pitches = {}
+	for midi_pitch in range(128):
+		for note_name in note_names[midi_pitch % 12]:
+			octave = midi_pitch // 12 - 1
+			# B# is technically in the octave above (starting from C)
+			# Cb is technically in the octave below
+			if note_name.startswith("B#"):
+				octave -= 1
+			elif note_name.startswith("Cb"):
+				octave += 1
+			if octave < 3:
+				octave_mark = ',' * (3 - octave)
+			else:
+				octave_mark = "'" * (octave - 3)
+			accidental_mark = "is" * note_name.count('#') + "es" * note_name.count('b')
+
+			lily_pitches[midi_pitch, note_name[0]] = "".join([
+				note_name[0].lower(), accidental_mark, octave_mark
+			])
+
+	return lily_pitches
+
+
+def make_sheet_note_names(note_letters, note_names):
+	"""Map every note letter and midi pitch to a sheet music note name"""
+	sheet_note_names = [[None] * 128 for _ in note_letters]
+	for midi_pitch in range(128):
+		octave = midi_pitch // 12 - 1
+		for note_name in note_names[midi_pitch % 12]:
+			letter_index = note_letters.index(note_name[0])
+			sheet_note_names[letter_index][midi_pitch] = f"{note_name}{octave}"
+
+	return tuple(tuple(letter_names) for letter_names in sheet_note_names)
+
+
+Note = collections.namedtuple('Note', ["pitch", "time", "duration"])
+
+
+class NoteSequence:
+	"""A voice part stored as columns of midi pitch, start tick and duration"""
+
+	__slots__ = ("pitches", "times", "durations")
+	# rests have a pitch no midi note can have
+	rest_pitch = -1
+
+	def __init__(self, notes=()):
+		self.pitches = array('h')
+		self.times = array('i')
+		self.durations = array('i')
+		for note in notes:
+			self.append(note)
+
+	def append(self, note):
+		pitch, time, duration = note
+		self.pitches.append(pitch)
+		self.times.append(time)
+		self.durations.append(duration)
+
+	def stamp(self, pitches, times, durations):
+		"""Append a run of notes given as columns"""
+		self.pitches.extend(pitches)
+		self.times.extend(times)
+		self.durations.extend(durations)
+
+	def __len__(self):
+		return len(self.pitches)
+
+	def __getitem__(self, index):
+		return Note(self.pitches[index], self.times[index], self.durations[index])
+
+	def __setitem__(self, index, note):
+		self.pitches[index], self.times[index], self.durations[index] = note
+
+	def __iter__(self):
+		return map(Note, self.pitches, self.times, self.durations)
+
+	def __repr__(self):
+		return f"NoteSequence({list(self)})"
+
+
 class Voice(Score):
 
 	chord_sequence = []
@@ -11,7 +94,8 @@ class Voice(Score):
 	all_midi_pitches = []
 	chord_acceleration = False
 
-	Note = collections.namedtuple('Note', ["pitch", "time", "duration"])
+	Note = Note
+	rest_pitch = NoteSequence.rest_pitch
 	midi_score = []
 	lily_score = []
 	chorale_scale_degrees = []
@@ -20,11 +104,6 @@ class Voice(Score):
 	max_note_duration = 0
 	voice_volumes = (70, 50, 50, 50)
 
-	bass_motion = []
-	tenor_motion = []
-	alto_motion = []
-	soprano_motion = []
-
 	interval_names = {
 		(0,0): "P8", (0,1): "d2", (1,0): "A1", (1,1): "m2", (2,1): "M2", 
 		(2,2): "d3", (3,1): "A2", (3,2): "m3", (4,2): "M3", (4,3): "d4", 
@@ -33,6 +112,15 @@ class Voice(Score):
 		(10,5): "A6", (10,6): "m7", (11,6): "M7", (11,7): "d8", (0,6): "A7", 
 		(11,0): "d8",
 	}
+	# [note letter index][midi pitch]: sheet note e.g., [1][61]: "Db4"
+	sheet_note_names = make_sheet_note_names(Score.note_letters, Score.note_names)
+	# tonic: [scale degree][midi pitch]: sheet note
+	spelling_tables = {}
+	# (midi pitch, note letter): lilypond pitch e.g., (61, "D"): "des'"
+	lily_pitches = make_lily_pitches(Score.note_names)
+	# (beat division, ticks): (tied note durations, rest durations)
+	lily_rhythms = {}
+
 	leading_degrees = {
 		"V/V": 3, "V7/V": 3, "V6/V": 3, "V65/V": 3, "V43/V": 3, "VII6/V": 3, 
 		"V42/V": 3, "V/III": 1,"V7/III": 1,"V6/III": 1, "V65/III": 1, 
@@ -133,7 +221,7 @@ class Voice(Score):
 		"""Generates voicing combinations for a given chord"""
 		current_pitches_dict = current_chord_obj.pitches_to_degrees
 		possible_midi_pitches = [[] for _ in range(4)]
-		for midi_pitch in current_pitches_dict:
+		for midi_pitch in current_chord_obj.chord_pitches:
 			if 40 <= midi_pitch <= 60:
 				possible_midi_pitches[0].append(midi_pitch)
 			if 48 <= midi_pitch <= 67:
@@ -190,111 +278,84 @@ class Voice(Score):
 
 		return validated_pitch_combos
 
-	def set_sheet_notes(self):
-		"""Convert midi pitches into sheet music note names"""
+	@classmethod
+	def get_spelling_table(cls, tonic):
+		"""Look up sheet note names by scale degree and midi pitch in a key"""
+		if tonic not in cls.spelling_tables:
+			tonic_index = cls.note_letters.index(tonic[0])
+			cls.spelling_tables[tonic] = tuple(
+				cls.sheet_note_names[(tonic_index + scale_degree) % 7]
+				for scale_degree in range(7)
+			)
 
-		tonic_letter = self.tonic.replace('#',"").replace('b',"")
-		tonic_index = self.note_letters.index(tonic_letter)
+		return cls.spelling_tables[tonic]
 
-		self.logger.warning(len(self.midi_notes))
-		self.logger.warning(len(self.unnested_scale_degrees))
+	@classmethod
+	def get_enharmonic_note(cls, midi_pitch):
+		"""Name a midi pitch with the fewest accidentals, whatever its letter"""
+		note_name = min(cls.note_names[midi_pitch % 12], key=len)
+		return f"{note_name}{midi_pitch // 12 - 1}"
+
+	def set_sheet_notes(self):
+		"""Convert midi pitches into sheet music note names"""
 
-		for midi_note, scale_degree in zip(
-		  self.midi_notes, self.unnested_scale_degrees):
-			self.logger.warning(midi_note)
-			self.logger.warning(scale_degree)
+		spelling_table = self.get_spelling_table(self.tonic)
+		for midi_pitch, scale_degree in zip(
+		  self.midi_notes.pitches, self.unnested_scale_degrees):
 			if scale_degree is None:
 				self.sheet_notes.append(None)
 				continue
-			true_midi_pitch = midi_note.pitch
-			scale_midi_pitch =  true_midi_pitch % 12
-			possible_note_names = self.note_names[scale_midi_pitch]
+			sheet_note = spelling_table[scale_degree % 7][midi_pitch]
+			if sheet_note is None:
+				# a pitch too far from its scale degree still sounds
+				sheet_note = self.get_enharmonic_note(midi_pitch)
+				self.logger.warning(
+					f"No spelling of {midi_pitch} as degree {scale_degree}, "
+					f"using {sheet_note}"
+				)
+			self.sheet_notes.append(sheet_note)
 
-			note_letter_index = (tonic_index + scale_degree) % 7
-			note_letter = self.note_letters[note_letter_index]
-			octave = true_midi_pitch // 12 - 1
+		self.logger.warning(f"Sheet notes: {self.sheet_notes}")
 
-			for possible_note_name in possible_note_names:
-				if note_letter in possible_note_name:
-					self.sheet_notes.append(f"{possible_note_name}{octave}")
-					break
+	def get_lily_rhythm(self, note_duration):
+		"""Look up the lilypond durations of a note length in ticks"""
+		rhythm_key = (self.beat_division, note_duration)
+		if rhythm_key not in self.lily_rhythms:
+			object_rhythm = Voice.partition_rhythm(
+				self.beat_durations, Fraction(numerator=note_duration, denominator=960)
+			)
+			lily_durations = [
+				self.beat_durations[beat_part] for beat_part in object_rhythm
+			]
+			tied_durations = [f"{lily_duration}~" for lily_duration in lily_durations]
+			tied_durations[-1] = lily_durations[-1]
+			self.lily_rhythms[rhythm_key] = (
+				tuple(tied_durations),
+				tuple(f"r{lily_duration}" for lily_duration in lily_durations),
+			)
 
-		self.logger.warning(f"Sheet notes: {self.sheet_notes}")
+		return self.lily_rhythms[rhythm_key]
 
 	def make_lily_part(self):
 		"""Write sheet music text notation for voice part"""
 
-		object_index = 0
 		if self.pickup:
 			object_duration = self.pickup_duration // 960
 			lily_part = [f"\\partial {self.beat_durations[object_duration]}"]
 		else:
 			lily_part = []
 
-		for midi_note, sheet_note in zip(self.midi_notes, self.sheet_notes):
-			self.logger.warning(midi_note)
-			self.logger.warning(sheet_note)
-			self.logger.warning(object_index)
-
-			object_duration = Fraction(numerator=midi_note.duration, denominator=960)
-			object_rhythm = Voice.partition_rhythm(
-				self.beat_durations, object_duration
-			)
+		for midi_pitch, midi_duration, sheet_note in zip(
+		  self.midi_notes.pitches, self.midi_notes.durations, self.sheet_notes):
+			note_durations, rest_durations = self.get_lily_rhythm(midi_duration)
 			if sheet_note is None:
-				lily_rest = ""
-				for rest_part in object_rhythm[:-1]:
-					lily_rest = "".join([
-						lily_rest, "r", self.beat_durations[rest_part], " "])
-
-				lily_rest = "".join([
-					lily_rest, "r", self.beat_durations[object_rhythm[-1]]])
-
-				lily_part.append(lily_rest)
-				continue
-
-			accidental_mark = ""
-			octave_mark = ""
-			note_letter = sheet_note[0].lower()
-			register_shift = 0
-
-			# B# is technically in the octave above (starting from C)
-			# Cb is technically in the octave below
-			if sheet_note.startswith(("B#", "B##")):
-				register_shift -= 1
-			elif sheet_note.startswith(("Cb", "Cbb")):
-				register_shift += 1
-			octave = int(sheet_note[-1]) + register_shift
-			if octave < 3:
-				octave_shift = 3 - octave
-				octave_mark = str(octave_shift * ',')
-			elif octave > 3:
-				octave_shift = octave - 3
-				octave_mark = str(octave_shift * "'")
-			if '#' in sheet_note or 'b' in sheet_note:
-				accidental = sheet_note[1]
-				if accidental == '#':
-					accidental_amount = sheet_note.count('#')
-					accidental_mark = "is" * accidental_amount
-				elif accidental == 'b':
-					accidental_amount = sheet_note.count('b')
-					accidental_mark = "es" * accidental_amount
-
-			lily_note = ""
-			for beat_part in object_rhythm[:-1]:
-				lily_note = "".join([
-					lily_note, note_letter, accidental_mark, octave_mark,
-					self.beat_durations[beat_part], "~ "
-				])
-
-			lily_note = "".join([
-				lily_note, note_letter, accidental_mark, octave_mark, 
-				self.beat_durations[object_rhythm[-1]]
-			])
-
-			lily_part.append(lily_note)
-			object_index += 1
+				lily_part.extend(rest_durations)
+			else:
+				lily_pitch = self.lily_pitches[midi_pitch, sheet_note[0]]
+				for note_duration in note_durations:
+					lily_part.append(lily_pitch + note_duration)
 
-		lily_string = " ".join(note for note in lily_part) 
+		lily_string = " ".join(lily_part) 
 		self.lily_score.append(lily_string)
 		self.logger.warning(f"Lily part: {lily_part}")
 
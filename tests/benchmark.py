@@ -0,0 +1,216 @@
+import argparse
+import collections
+import contextlib
+import functools
+import inspect
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+from generate.idioms.score import Score
+from generate.midi_export import readMIDIFile
+from generate.piece import MIDIScore
+from generate.voices.chorale import Chorale
+from generate.voices.melody import Melody
+from generate.voices.voice import Voice
+import main
+
+# stages are timed by wrapping the original methods for the duration of a run
+timed_stages = (
+	(Melody, "realize_melody"), (Chorale, "make_chord_voicings"),
+	(Voice, "make_pitch_combos"), (MIDIScore, "write_file"),
+)
+
+
+@contextlib.contextmanager
+def instrument_stages(stage_timings):
+	"""Record the latency of every call to a timed stage"""
+
+	original_methods = []
+	for stage_cls, stage_name in timed_stages:
+		original_method = inspect.getattr_static(stage_cls, stage_name)
+		original_methods.append((stage_cls, stage_name, original_method))
+		if isinstance(original_method, classmethod):
+			stage_func = original_method.__func__
+		else:
+			stage_func = original_method
+
+		@functools.wraps(stage_func)
+		def timed_stage(*args, stage_func=stage_func, stage_name=stage_name, **kwargs):
+			start_time = time.perf_counter()
+			try:
+				return stage_func(*args, **kwargs)
+			finally:
+				stage_timings[stage_name].append(time.perf_counter() - start_time)
+
+		if isinstance(original_method, classmethod):
+			timed_stage = classmethod(timed_stage)
+		setattr(stage_cls, stage_name, timed_stage)
+
+	try:
+		yield
+	finally:
+		for stage_cls, stage_name, original_method in original_methods:
+			setattr(stage_cls, stage_name, original_method)
+
+
+def summarize_latencies(samples):
+	"""Reduce a list of latencies (in seconds) to a distribution summary"""
+
+	if not samples:
+		return {"count": 0}
+	if len(samples) > 1:
+		cut_points = statistics.quantiles(samples, n=100, method="inclusive")
+		p50, p95, p99 = cut_points[49], cut_points[94], cut_points[98]
+	else:
+		p50 = p95 = p99 = samples[0]
+
+	return {
+		"count": len(samples), "mean": statistics.fmean(samples),
+		"p50": p50, "p95": p95, "p99": p99, "max": max(samples),
+	}
+
+
+def make_benchmark_piece(score_args):
+	"""Generate and serialize a single piece, as main.py does"""
+
+	main.make_score(score_args)
+	midi_file = main.make_midi_file()
+	midi_data = io.BytesIO()
+	midi_file.write_file(midi_data)
+	return midi_data.getvalue()
+
+
+def verify_round_trip(midi_data):
+	"""Check that a MIDI file is unchanged after being read and rewritten"""
+
+	round_trip_data = io.BytesIO()
+	readMIDIFile(midi_data).writeFile(round_trip_data)
+	if round_trip_data.getvalue() != midi_data:
+		raise ValueError("MIDI output does not survive a round trip")
+
+
+def run_configuration(mode, time_sig, seeds, midi_pieces=None):
+	"""Benchmark a single mode and time signature over several seeds"""
+
+	score_args = argparse.Namespace(
+		tonic=None, mode=mode, style=None, time_sig=time_sig
+	)
+	piece_durations = []
+	for seed in seeds:
+		random.seed(seed)
+		start_time = time.perf_counter()
+		midi_data = make_benchmark_piece(score_args)
+		piece_durations.append(time.perf_counter() - start_time)
+		if midi_pieces is not None:
+			midi_pieces.append(midi_data)
+
+	return piece_durations
+
+
+def name_time_sig(time_sig):
+	"""Write a time signature the way it appears on sheet music"""
+	measure_length, beat_division = time_sig
+	if beat_division == 3:
+		return f"{measure_length * 3}/8"
+	return f"{measure_length}/4"
+
+
+def get_commit():
+	try:
+		return subprocess.run(
+			("git", "rev-parse", "HEAD"), capture_output=True, text=True,
+			check=True
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def run_benchmark(runs=1, base_seed=0, modes=None, time_sigs=None, verify=False):
+	"""Benchmark generation throughput for every mode and time signature"""
+
+	if modes is None:
+		modes = tuple(Score.mode_notes)
+	if time_sigs is None:
+		# duplicate time signatures only alter the probability of selection
+		time_sigs = tuple(dict.fromkeys(Score.time_sigs))
+	seeds = range(base_seed, base_seed + runs)
+
+	stage_timings = collections.defaultdict(list)
+	configurations = {}
+	all_piece_durations = []
+	midi_pieces = [] if verify else None
+	with instrument_stages(stage_timings), contextlib.redirect_stdout(io.StringIO()):
+		for mode in modes:
+			for time_sig in time_sigs:
+				piece_durations = run_configuration(
+					mode, time_sig, seeds, midi_pieces
+				)
+				all_piece_durations.extend(piece_durations)
+				configurations[f"{mode} {name_time_sig(time_sig)}"] = {
+					"pieces_per_second": len(piece_durations) / sum(piece_durations),
+					"latency": summarize_latencies(piece_durations),
+				}
+
+	# verified after timing, so the rewrites don't count towards write_file
+	if verify:
+		for midi_data in midi_pieces:
+			verify_round_trip(midi_data)
+
+	return {
+		"commit": get_commit(),
+		"python": platform.python_version(),
+		"runs": runs,
+		"seeds": [seeds.start, seeds.stop],
+		"verified": verify,
+		"pieces": len(all_piece_durations),
+		"pieces_per_second": len(all_piece_durations) / sum(all_piece_durations),
+		"piece_latency": summarize_latencies(all_piece_durations),
+		"stages": {
+			stage_name: summarize_latencies(stage_timings[stage_name])
+			for _, stage_name in timed_stages
+		},
+		"configurations": configurations,
+	}
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(
+		description="Measure the generation throughput of Robatim"
+	)
+	parser.add_argument(
+		'-r', "--runs", type=int, default=1,
+		help="seeded pieces per mode and time signature"
+	)
+	parser.add_argument("--seed", type=int, default=0, help="first random seed")
+	parser.add_argument('-m', "--mode", action="append", dest="modes")
+	parser.add_argument(
+		"--verify", action="store_true",
+		help="check that every MIDI file survives being read and rewritten"
+	)
+	parser.add_argument(
+		'-o', "--output", default="logs/benchmark.json",
+		help="machine-readable results file"
+	)
+	bench_args = parser.parse_args()
+
+	results = run_benchmark(
+		bench_args.runs, bench_args.seed, bench_args.modes, verify=bench_args.verify
+	)
+	with open(bench_args.output, 'w') as f:
+		json.dump(results, f, indent=2, sort_keys=True)
+		f.write("\n")
+
+	print(f"{results['pieces']} pieces at {results['pieces_per_second']:.3f} pieces/s")
+	for stage_name, latencies in results["stages"].items():
+		if latencies["count"]:
+			print(
+				f"{stage_name}: p50 {latencies['p50'] * 1000:.2f} ms, "
+				f"p95 {latencies['p95'] * 1000:.2f} ms, "
+				f"p99 {latencies['p99'] * 1000:.2f} ms"
+			)
+	print(f"Results written to {bench_args.output}")
@@ -0,0 +1,60 @@
+import http.server
+import json
+import threading
+
+class StubLilybinServer:
+	"""A local stand-in for the lilybin preview and score endpoints"""
+
+	def __init__(self):
+		self.scores = {}
+		self.server = http.server.ThreadingHTTPServer(
+			("127.0.0.1", 0), self.make_handler()
+		)
+		host, port = self.server.server_address
+		self.preview_url = f"http://{host}:{port}/prepare_preview/stable"
+		self.pdf_url = f"http://{host}:{port}/scores/{{}}.pdf"
+		self.server_thread = None
+
+	def make_handler(self):
+		scores = self.scores
+
+		class StubHandler(http.server.BaseHTTPRequestHandler):
+
+			def do_POST(self):
+				if self.path != "/prepare_preview/stable":
+					self.send_error(404)
+					return
+				payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+				score_id = str(len(scores))
+				scores[score_id] = f"%PDF-stub\n{payload['code']}".encode()
+				self.send_body(json.dumps({"id": score_id}).encode())
+
+			def do_GET(self):
+				score_id = self.path.rpartition('/')[2].replace(".pdf", "")
+				if not self.path.startswith("/scores/") or score_id not in scores:
+					self.send_error(403)
+					return
+				self.send_body(scores[score_id])
+
+			def send_body(self, body):
+				self.send_response(200)
+				self.send_header("Content-Length", str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, *args):
+				pass
+
+		return StubHandler
+
+	def __enter__(self):
+		self.server_thread = threading.Thread(
+			target=self.server.serve_forever, daemon=True
+		)
+		self.server_thread.start()
+		return self
+
+	def __exit__(self, *exc_info):
+		self.server.shutdown()
+		self.server.server_close()
+		self.server_thread.join()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from tests.benchmark import get_commit, summarize_latencies
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# every stage runs in a fresh interpreter, the way the CLI is invoked
+startup_stages = {
+	"interpreter": "pass",
+	"import": "import main",
+	"first_piece": (
+		"import contextlib, io, random, types\n"
+		"import main\n"
+		"random.seed({seed})\n"
+		"score_args = types.SimpleNamespace("
+		"tonic='D', mode='major', style='Mm', time_sig=(4, 2))\n"
+		"with contextlib.redirect_stdout(io.StringIO()):\n"
+		"	main.make_score(score_args)\n"
+		"	main.make_midi_file().write_file(io.BytesIO())\n"
+	),
+}
+
+
+def time_stage(stage_code):
+	"""Time a fresh interpreter from launch until it has run some code"""
+	start_time = time.perf_counter()
+	subprocess.run((sys.executable, "-c", stage_code), cwd=package_dir, check=True)
+	return time.perf_counter() - start_time
+
+
+def run_startup_benchmark(runs=10, seed=1):
+	"""Measure how long one-shot invocations take to produce a piece"""
+
+	stage_latencies = {stage_name: [] for stage_name in startup_stages}
+	# stages take turns, so background load affects all of them alike
+	for _ in range(runs):
+		for stage_name, stage_code in startup_stages.items():
+			stage_latencies[stage_name].append(
+				time_stage(stage_code.format(seed=seed))
+			)
+
+	return {
+		"commit": get_commit(),
+		"python": platform.python_version(),
+		"runs": runs,
+		"seed": seed,
+		"stages": {
+			stage_name: summarize_latencies(latencies)
+			for stage_name, latencies in stage_latencies.items()
+		},
+	}
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(
+		description="Measure how quickly a one-shot Robatim invocation starts"
+	)
+	parser.add_argument(
+		'-r', "--runs", type=int, default=10, help="interpreters launched per stage"
+	)
+	parser.add_argument("--seed", type=int, default=1, help="random seed of the piece")
+	parser.add_argument(
+		'-o', "--output", default="logs/startup_benchmark.json",
+		help="machine-readable results file"
+	)
+	bench_args = parser.parse_args()
+
+	results = run_startup_benchmark(bench_args.runs, bench_args.seed)
+	with open(bench_args.output, 'w') as f:
+		json.dump(results, f, indent=2, sort_keys=True)
+		f.write("\n")
+
+	for stage_name, latencies in results["stages"].items():
+		print(
+			f"{stage_name}: p50 {latencies['p50'] * 1000:.2f} ms, "
+			f"p95 {latencies['p95'] * 1000:.2f} ms"
+		)
+	print(f"Results written to {bench_args.output}")
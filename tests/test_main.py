@@ -1,11 +1,23 @@
+import contextlib
 from fractions import Fraction
+import io
 import json
+import os
+import random
 import requests
+import subprocess
+import sys
 import time
+import types
 import unittest
 
+from generate.idioms.chord import Chord
 from generate.idioms.progression import Progression
-from generate.voices.voice import Voice 
+from generate.idioms.score import Score
+from generate.piece import reset_score_settings
+from generate.voices.chorale import Chorale
+from generate.voices.melody import Melody
+from generate.voices.voice import NoteSequence, Voice 
 
 class MainScoreMethods(unittest.TestCase):
 
@@ -35,6 +47,16 @@ class MainScoreMethods(unittest.TestCase):
 			f"https://s3-us-west-2.amazonaws.com/lilybin-scores/{response_id}.pdf")
 		self.assertTrue(pdf_response.status_code == 200)
 
+	def test_lazy_imports(self):
+		package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+		imported_modules = subprocess.run(
+			(sys.executable, "-c", "import sys, main; print(*sys.modules)"),
+			cwd=package_dir, capture_output=True, text=True, check=True
+		).stdout.split()
+		self.assertNotIn("requests", imported_modules)
+		self.assertNotIn("subprocess", imported_modules)
+		self.assertNotIn("generate.midi_export", imported_modules)
+
 	def test_motifs(self):
 		self.assertFalse(Voice.has_cross_duplicates([]))
 		self.assertFalse(Voice.has_cross_duplicates([0, 0, 0, 0, 0]))
@@ -106,6 +128,144 @@ class MainScoreMethods(unittest.TestCase):
 			Voice.partition_rhythm(compound_durations, Fraction("10/3")),
 			[Fraction("8/3"), Fraction("2/3")])
 
+	def test_lily_pitches(self):
+		self.assertEqual(Voice.lily_pitches[48, "C"], "c")
+		self.assertEqual(Voice.lily_pitches[61, "C"], "cis'")
+		self.assertEqual(Voice.lily_pitches[61, "D"], "des'")
+		self.assertEqual(Voice.lily_pitches[40, "E"], "e,")
+		self.assertEqual(Voice.lily_pitches[74, "E"], "eeses''")
+
+		self.assertEqual(Voice.lily_pitches[60, "B"], "bis")
+		self.assertEqual(Voice.lily_pitches[59, "C"], "ces'")
+		self.assertEqual(Voice.lily_pitches[61, "B"], "bisis")
+		self.assertNotIn((61, "E"), Voice.lily_pitches)
+
+	def test_spelling_tables(self):
+		for tonic in Voice.tonics:
+			spelling_table = Voice.get_spelling_table(tonic)
+			tonic_index = Voice.note_letters.index(tonic[0])
+			for scale_degree in range(7):
+				note_letter = Voice.note_letters[(tonic_index + scale_degree) % 7]
+				for midi_pitch in range(128):
+					# the first name of the pitch class with the letter of the degree
+					note_names = [
+						f"{note_name}{midi_pitch // 12 - 1}"
+						for note_name in Voice.note_names[midi_pitch % 12]
+						if note_letter in note_name
+					]
+					self.assertEqual(
+						spelling_table[scale_degree][midi_pitch],
+						note_names[0] if note_names else None
+					)
+
+		self.assertEqual(Voice.get_enharmonic_note(61), "C#4")
+		self.assertEqual(Voice.get_enharmonic_note(60), "C4")
+		self.assertEqual(Voice.get_enharmonic_note(70), "A#4")
+
+	def test_note_sequence(self):
+		midi_notes = NoteSequence([Voice.Note(Voice.rest_pitch, 0, 480), (60, 480, 960)])
+		midi_notes.append(Voice.Note(62, 1440, 480))
+		self.assertEqual(len(midi_notes), 3)
+		self.assertEqual(midi_notes[-2], Voice.Note(60, 480, 960))
+		self.assertEqual(list(midi_notes.pitches), [Voice.rest_pitch, 60, 62])
+
+		midi_notes[-2] = Voice.Note(60, 570, 960)
+		self.assertEqual(list(midi_notes)[1:], [(60, 570, 960), (62, 1440, 480)])
+
+	def test_chord_pitches(self):
+		minor_dominant = Chord("0V", "C", "aeolian")
+		self.assertEqual(minor_dominant.pitches_to_degrees[71], 6)
+		self.assertEqual(minor_dominant.pitches_to_degrees[70], Chord.no_degree)
+		self.assertEqual(list(minor_dominant.chord_pitches[:3]), [7, 11, 2])
+		self.assertEqual(Chord("0V", "G", "ionian").pitches_to_degrees[62], 4)
+
+		self.assertIs(Chord("0V", "C", "aeolian"), minor_dominant)
+		self.assertNotEqual(Chord("+V", "C", "aeolian"), minor_dominant)
+		self.assertNotEqual(Chord("0V", "C", "ionian"), minor_dominant)
+		self.assertFalse(hasattr(minor_dominant, "__dict__"))
+
+		sharp_tonic = Chord("0I", "C#", "dorian")
+		self.assertIs(sharp_tonic.chord_pitches, Chord("0I", "Db", "dorian").chord_pitches)
+		self.assertEqual(
+			[pitch for pitch in range(60, 72) if sharp_tonic.pitches_to_degrees[pitch] != Chord.no_degree],
+			[61, 64, 68]
+		)
+
+	def test_rhythm_catalogue(self):
+		total_weights = [cum_weights[-1] for _, cum_weights in Melody.phrase_rhythms]
+		self.assertEqual(total_weights, [3, 28, 14, 3])
+		for time_sig in Melody.time_sigs:
+			rhythm_mapping = Melody.rhythm_catalogue[time_sig]
+			self.assertEqual(set(rhythm_mapping), {-2, -1, 0, 1, 2})
+			beat_length = sum(rhythm_mapping[-1][0])
+			for possible_rhythms in rhythm_mapping.values():
+				self.assertIsInstance(possible_rhythms, tuple)
+				for rhythm in possible_rhythms:
+					self.assertEqual(sum(rhythm), beat_length)
+
+	def test_accompaniment_templates(self):
+		all_voices = Chorale.all_voices
+		chord_template, = Chorale.compile_accompaniment(
+			(480, 240, 480, 240, 480), (all_voices, 0, all_voices, 0, all_voices), 1920
+		)
+		note_offsets, note_durations, voice_masks = chord_template
+		self.assertEqual(list(note_offsets), [0, 480, 720, 1200, 1440])
+		self.assertEqual(list(note_durations), [480, 240, 480, 240, 480])
+		self.assertEqual(list(voice_masks), [all_voices, 0, all_voices, 0, all_voices])
+
+		first_template, second_template = Chorale.get_end_template(1920)
+		self.assertEqual(list(first_template[0]), [0])
+		self.assertEqual(list(first_template[2]), [all_voices])
+		self.assertEqual(list(second_template[2]), [0])
+
+		for time_sig in Chorale.accompaniment_patterns:
+			self.assertIs(
+				Chorale.get_accompaniment_templates(time_sig, 1920),
+				Chorale.get_accompaniment_templates(time_sig, 1920)
+			)
+
+	def test_phrase_starts(self):
+		harmony = Chorale()
+		harmony.unique_chord_indices = {0, 2, 5, 8, 9, 13, 16, 17, 20, 22}
+		harmony.condensed_chords = [None] * 10
+		self.assertEqual(harmony.get_phrase_starts(), [0, 3, 6])
+
+		# a short final phrase is voiced with the phrase before it
+		harmony.unique_chord_indices = {0, 2, 5, 8, 9, 13, 16, 17}
+		harmony.condensed_chords = [None] * 8
+		self.assertEqual(harmony.get_phrase_starts(), [0, 3])
+
+	def test_phrase_join(self):
+		score_args = types.SimpleNamespace(
+			tonic="D", mode="major", style="Mm", time_sig=(4, 2), form="binary"
+		)
+		random_state = random.getstate()
+		old_log_dir = Score.log_dir
+		try:
+			random.seed(1)
+			Score.log_dir = None
+			with contextlib.redirect_stdout(io.StringIO()):
+				reset_score_settings(score_args)
+				Melody().make_melody()
+				harmony = Chorale()
+				harmony.condense_chords()
+				harmony.make_chord_voicings()
+		finally:
+			Score.log_dir = old_log_dir
+			random.setstate(random_state)
+		self.assertGreater(len(harmony.get_phrase_starts()), 2)
+
+		# every stitched voicing must follow the chords before it
+		voicings = harmony.chosen_chord_voicings
+		replay = Chorale()
+		replay.condense_chords()
+		replay.start_search(0, len(voicings))
+		replay.pinned_voicings = dict(enumerate(voicings))
+		for chord_index, voicing in enumerate(voicings):
+			self.assertEqual(next(replay.populate_chord(), None), voicing)
+			replay.chosen_chord_voicings[chord_index] = voicing
+			replay.chord_index += 1
+
 	def test_list_merger(self):
 		self.assertEqual(Voice.merge_lists([]), [])
 		self.assertEqual(Voice.merge_lists([], [], []), [])
@@ -0,0 +1,200 @@
+import concurrent.futures
+import io
+import os
+import tempfile
+import unittest
+
+from generate.midi_export import (
+	MIDIFile, MIDIStreamWriter, Tempo, readMIDIFile, readVarLength, writeVarLength
+)
+from generate.voices.voice import NoteSequence
+
+# (pitch, tick, duration) of a voice that restrikes a sounding note at 1440
+NOTES = ((60, 0, 960), (64, 960, 960), (62, 960, 480), (64, 1440, 960), (60, 1920, 960))
+
+class UnseekableFile(io.BytesIO):
+
+	def seekable(self):
+		return False
+
+
+class MidiExportMethods(unittest.TestCase):
+
+	def make_midi_data(self):
+		midi_file = MIDIFile(1, eventtime_is_ticks=True)
+		midi_file.addProgramChange(0, 0, 0, 73)
+		for pitch, tick, duration in NOTES:
+			midi_file.addNote(0, 0, pitch, tick, duration, 100)
+		midi_file.addTempo(0, 0, 90)
+		midi_data = io.BytesIO()
+		midi_file.writeFile(midi_data)
+		return midi_data.getvalue()
+
+	def stream_midi_data(self, midi_data):
+		midi_writer = MIDIStreamWriter(midi_data, 2)
+		midi_writer.startTrack()
+		midi_writer.addTempo(0, 90)
+		midi_writer.startTrack()
+		midi_writer.addProgramChange(0, 0, 73)
+		for pitch, tick, duration in NOTES:
+			midi_writer.addNote(0, pitch, tick, duration, 100)
+		midi_writer.close()
+		return midi_data.getvalue()
+
+	def test_stream_writer(self):
+		midi_data = self.make_midi_data()
+		self.assertEqual(self.stream_midi_data(io.BytesIO()), midi_data)
+		self.assertEqual(self.stream_midi_data(UnseekableFile()), midi_data)
+
+		midi_writer = MIDIStreamWriter(io.BytesIO())
+		midi_writer.startTrack()
+		tempo_event = Tempo(480, 90)
+		midi_writer.addEvent(tempo_event)
+		self.assertEqual(tempo_event.tick, 480)
+		midi_writer.addNote(0, 60, 960, 960, 100)
+		with self.assertRaises(ValueError):
+			midi_writer.addNote(0, 62, 0, 960, 100)
+
+	def test_deinterleave_channels(self):
+		# pitch 101 on channel 5 must not be mistaken for pitch 10 on channel 15
+		channel_notes = ((5, 101, 0, 960), (15, 10, 480, 960), (15, 10, 960, 960))
+		midi_file = MIDIFile(1, eventtime_is_ticks=True)
+		for channel, pitch, tick, duration in channel_notes:
+			midi_file.addNote(0, channel, pitch, tick, duration, 100)
+		midi_data = io.BytesIO()
+		midi_file.writeFile(midi_data)
+
+		midi_writer = MIDIStreamWriter(io.BytesIO(), 2)
+		midi_writer.startTrack()
+		midi_writer.startTrack()
+		for channel, pitch, tick, duration in channel_notes:
+			midi_writer.addNote(channel, pitch, tick, duration, 100)
+		midi_writer.close()
+		self.assertEqual(midi_data.getvalue(), midi_writer.fileHandle.getvalue())
+
+	def test_parallel_encode(self):
+		midi_data = []
+		executors = (
+			None, concurrent.futures.ThreadPoolExecutor(2),
+			concurrent.futures.ProcessPoolExecutor(2),
+		)
+		for executor in executors:
+			midi_file = MIDIFile(4, eventtime_is_ticks=True)
+			for track in range(4):
+				for pitch, tick, duration in NOTES:
+					midi_file.addNote(track, track, pitch + track, tick, duration, 100)
+			midi_file.addTempo(0, 0, 90)
+			midi_stream = io.BytesIO()
+			midi_file.writeFile(midi_stream, executor)
+			midi_data.append(midi_stream.getvalue())
+			if executor is not None:
+				executor.shutdown()
+
+		self.assertEqual(midi_data[1], midi_data[0])
+		self.assertEqual(midi_data[2], midi_data[0])
+
+	def test_read_midi_file(self):
+		midi_data = self.make_midi_data()
+		midi_file = readMIDIFile(midi_data)
+		note_track = midi_file.tracks[1]
+		self.assertEqual(list(note_track.notePitches), [60, 60, 64, 62, 64, 62, 64, 60, 64, 60])
+		self.assertEqual(midi_file.tracks[0].eventList[0].tempo, 666666)
+
+		round_trip_data = io.BytesIO()
+		midi_file.writeFile(round_trip_data)
+		self.assertEqual(round_trip_data.getvalue(), midi_data)
+
+		with tempfile.TemporaryDirectory() as temp_dir:
+			midi_path = os.path.join(temp_dir, "song.mid")
+			with open(midi_path, 'wb') as f:
+				f.write(midi_data)
+			round_trip_data = io.BytesIO()
+			readMIDIFile(midi_path).writeFile(round_trip_data)
+		self.assertEqual(round_trip_data.getvalue(), midi_data)
+
+	def test_zero_length_notes(self):
+		midi_file = MIDIFile(1)
+		midi_file.addNote(0, 0, 60, 0, 0, 100)
+		midi_file.addNote(0, 0, 60, 1, 1, 100)
+		midi_file.addNotes(0, 0, ((62, 2, 0), (62, 2, 1)), 100)
+		midi_data = io.BytesIO()
+		midi_file.writeFile(midi_data)
+
+		note_track = readMIDIFile(midi_data.getvalue()).tracks[1]
+		self.assertEqual(list(note_track.noteTicks), [960, 1920, 1920, 2880])
+		self.assertEqual(list(note_track.notePitches), [60, 60, 62, 62])
+		self.assertEqual(list(note_track.noteTypes), [0x90, 0x80, 0x90, 0x80])
+
+	def test_overlapping_round_trip(self):
+		midi_file = MIDIFile(1)
+		# notes ending together are de-interleaved again if the file is read
+		for time, duration in ((5, 1), (4, 3), (3, 3), (6, 1)):
+			midi_file.addNote(0, 1, 64, time, duration, 100)
+		midi_data = io.BytesIO()
+		midi_file.writeFile(midi_data)
+
+		round_trip_data = io.BytesIO()
+		readMIDIFile(midi_data.getvalue()).writeFile(round_trip_data)
+		self.assertEqual(round_trip_data.getvalue(), midi_data.getvalue())
+
+	def test_invalid_notes(self):
+		midi_file = MIDIFile(1)
+		midi_file.addNotes(0, 0, ((60, 0, 1),), 100)
+		for voice_notes, volume in ((((62, 1, 1), (300, 2, 1)), 100), (((62, 1, 1),), 300)):
+			with self.assertRaises((ValueError, OverflowError)):
+				midi_file.addNotes(0, 0, voice_notes, volume)
+
+		# a pitch or channel past the MIDI range would share a key with another note
+		with self.assertRaises(ValueError):
+			midi_file.addNote(0, 0, 128, 1, 1, 100)
+		with self.assertRaises(ValueError):
+			midi_file.addNotes(0, 16, ((62, 1, 1),), 100)
+
+		# a rejected voice adds none of its notes
+		note_track = midi_file.tracks[1]
+		self.assertEqual(len(note_track.noteTicks), 2)
+		self.assertEqual(len(note_track.notePitches), 2)
+		midi_data = io.BytesIO()
+		midi_file.writeFile(midi_data)
+		self.assertEqual(list(readMIDIFile(midi_data.getvalue()).tracks[1].notePitches), [60, 60])
+
+	def test_var_length(self):
+		self.assertEqual(writeVarLength(0), b"\x00")
+		self.assertEqual(writeVarLength(128), b"\x81\x00")
+		self.assertEqual(writeVarLength(16383), b"\xff\x7f")
+		self.assertEqual(writeVarLength(16384), b"\x81\x80\x00")
+		for quantity in (127, 8192, 2 ** 21 - 1, 2 ** 21, 2 ** 28 - 1):
+			var_length = writeVarLength(quantity)
+			self.assertEqual(readVarLength(0, var_length), (quantity, len(var_length)))
+
+	def test_add_notes(self):
+		voice_notes = ((60, 0, 1), ("Rest", 1, 0.5), (62, 1.5, 0.5), (64, 2, 2))
+		midi_data = []
+		for batch in (False, True):
+			midi_file = MIDIFile(1)
+			if batch:
+				midi_file.addNotes(0, 0, voice_notes, 100)
+			else:
+				for pitch, time, duration in voice_notes:
+					if isinstance(pitch, int):
+						midi_file.addNote(0, 0, pitch, time, duration, 100)
+			midi_stream = io.BytesIO()
+			midi_file.writeFile(midi_stream)
+			midi_data.append(midi_stream.getvalue())
+
+		self.assertEqual(midi_data[1], midi_data[0])
+
+		# note columns mark rests with a pitch below zero
+		midi_data = []
+		for voice_notes in (NOTES, NoteSequence(NOTES[:2] + ((-1, 960, 960),) + NOTES[2:])):
+			midi_file = MIDIFile(1, eventtime_is_ticks=True)
+			midi_file.addNotes(0, 0, voice_notes, 100)
+			midi_stream = io.BytesIO()
+			midi_file.writeFile(midi_stream)
+			midi_data.append(midi_stream.getvalue())
+
+		self.assertEqual(midi_data[1], midi_data[0])
+
+
+if __name__ == "__main__":
+	unittest.main()
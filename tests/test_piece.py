@@ -0,0 +1,54 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from generate.midi_export import readMIDIFile
+from generate.piece import generate_piece
+
+class PieceMethods(unittest.TestCase):
+
+	def test_generate_piece(self):
+		random_state = random.getstate()
+		old_cwd = os.getcwd()
+		with tempfile.TemporaryDirectory() as temp_dir:
+			os.chdir(temp_dir)
+			try:
+				piece = generate_piece("D", "major", seed=1, time_sig=(4, 2))
+				same_piece = generate_piece("D", "major", seed=1, time_sig=(4, 2))
+			finally:
+				os.chdir(old_cwd)
+			self.assertEqual(os.listdir(temp_dir), [])
+		self.assertEqual(random.getstate(), random_state)
+
+		self.assertEqual(piece, same_piece)
+		self.assertEqual((piece.tonic, piece.mode), ("D", "ionian"))
+		self.assertEqual(len(piece.note_sequences), 5)
+		self.assertIn("Medley in D major", piece.lily_text)
+		self.assertEqual(piece.tempo_map[0][0], 0)
+		with self.assertRaises(AttributeError):
+			piece.lily_text = ""
+
+		midi_data = piece.midi_data()
+		self.assertEqual(midi_data, same_piece.midi_data())
+		self.assertEqual(len(readMIDIFile(midi_data).tracks), 6)
+		# the streamed file is the one MIDIFile writes for the same notes
+		round_trip_data = io.BytesIO()
+		readMIDIFile(midi_data).writeFile(round_trip_data)
+		self.assertEqual(round_trip_data.getvalue(), midi_data)
+
+	def test_form(self):
+		piece = generate_piece("D", "major", seed=1, time_sig=(4, 2), form="ternary")
+		self.assertEqual(piece.form, "ABA")
+		self.assertEqual(len(piece.chord_sequence), 48)
+		# the returning period is repeated rather than searched again
+		self.assertEqual(piece.chord_sequence[:16], piece.chord_sequence[32:])
+		self.assertNotEqual(piece.chord_sequence[:16], piece.chord_sequence[16:32])
+
+		with self.assertRaises(ValueError):
+			generate_piece(form="AbA")
+
+
+if __name__ == "__main__":
+	unittest.main()
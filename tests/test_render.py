@@ -0,0 +1,131 @@
+import importlib.util
+import os
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+from generate.render import (
+	LilybinRenderer, LilypondRenderer, LilyTemplate, Renderer, RenderError,
+	RenderPipeline
+)
+from tests.lily_stub import StubLilybinServer
+
+# imitates "lilypond --pdf -o <base> <file>" by copying the score into the pdf
+FAKE_LILYPOND = f"""#!{sys.executable}
+import sys
+if "\\\\error" in open(sys.argv[-1]).read():
+	sys.exit("score.ly:1: error: syntax error")
+with open(sys.argv[-1]) as lily_file, open(sys.argv[-2] + ".pdf", "w") as pdf_file:
+	pdf_file.write("%PDF-fake\\n" + lily_file.read())
+"""
+
+class RenderMethods(unittest.TestCase):
+
+	def setUp(self):
+		self.temp_dir = tempfile.TemporaryDirectory()
+		self.lilypond_path = os.path.join(self.temp_dir.name, "lilypond")
+		with open(self.lilypond_path, 'w') as f:
+			f.write(FAKE_LILYPOND)
+		os.chmod(self.lilypond_path, stat.S_IRWXU)
+
+	def tearDown(self):
+		self.temp_dir.cleanup()
+
+	def test_lily_template(self):
+		lily_template = LilyTemplate(
+			'title = "Medley"\nmelody = { PART_SLOT }\nbass = { PART_SLOT }'
+		)
+		self.assertEqual(
+			lily_template.fill("Medley in C major", ["c d e"]),
+			'title = "Medley in C major"\nmelody = { c d e }\nbass = {  }'
+		)
+		self.assertEqual(
+			lily_template.fill("Medley in A minor", ["a", "b", "c"]),
+			'title = "Medley in A minor"\nmelody = { a }\nbass = { b }'
+		)
+		self.assertEqual(LilyTemplate("{ c }").fill("Medley", ["d"]), "{ c }")
+
+	def test_lilypond_render(self):
+		renderer = LilypondRenderer(self.lilypond_path)
+		self.assertEqual(renderer.render("{ c d e }"), b"%PDF-fake\n{ c d e }")
+
+		with self.assertRaises(RenderError):
+			renderer.render("{ c \\error }")
+		with self.assertRaises(RenderError):
+			LilypondRenderer(os.path.join(self.temp_dir.name, "missing")).render("{ c }")
+
+	def test_abstract_renderer(self):
+		class SilentRenderer(Renderer):
+			pass
+
+		# a renderer without a render method can't be created
+		with self.assertRaises(TypeError):
+			SilentRenderer()
+
+	def test_worker_pool(self):
+		pdf_paths = [
+			os.path.join(self.temp_dir.name, f"score{score_num}.pdf")
+			for score_num in range(6)
+		]
+		with LilypondRenderer(self.lilypond_path, max_workers=2, max_pending=3) as renderer:
+			render_jobs = [
+				renderer.submit(f"{{ c{score_num} }}", pdf_path)
+				for score_num, pdf_path in enumerate(pdf_paths)
+			]
+			self.assertEqual([job.result() for job in render_jobs], pdf_paths)
+
+		for score_num, pdf_path in enumerate(pdf_paths):
+			with open(pdf_path, 'rb') as f:
+				self.assertEqual(f.read(), f"%PDF-fake\n{{ c{score_num} }}".encode())
+
+	def test_pipeline(self):
+		written_pieces = []
+		release_writer = threading.Event()
+
+		def write_piece(piece_num):
+			release_writer.wait()
+			written_pieces.append(piece_num)
+
+		with RenderPipeline(max_queued=2) as pipeline:
+			for piece_num in range(3):
+				pipeline.submit(write_piece, piece_num)
+			# the queue is full while the first piece is still being written
+			self.assertTrue(pipeline.piece_queue.full())
+			release_writer.set()
+		self.assertEqual(written_pieces, [0, 1, 2])
+
+		def fail_piece():
+			raise PermissionError
+
+		pipeline = RenderPipeline()
+		pipeline.submit(fail_piece)
+		pipeline.submit(written_pieces.append, 3)
+		with self.assertRaises(PermissionError):
+			pipeline.close()
+		self.assertEqual(written_pieces, [0, 1, 2, 3])
+		with self.assertRaises(RuntimeError):
+			pipeline.submit(written_pieces.append, 4)
+
+		# an error in the with body isn't replaced by a failed write
+		with self.assertRaises(KeyError), self.assertLogs("generate.render", "ERROR"):
+			with RenderPipeline() as pipeline:
+				pipeline.submit(fail_piece)
+				raise KeyError
+
+	@unittest.skipIf(importlib.util.find_spec("requests") is None, "requires requests")
+	def test_lilybin_render(self):
+		with StubLilybinServer() as stub_server:
+			renderer = LilybinRenderer(
+				stub_server.preview_url, stub_server.pdf_url, wait_time=0
+			)
+			self.assertEqual(renderer.render("{ c d e }"), b"%PDF-stub\n{ c d e }")
+
+			renderer.pdf_url = stub_server.pdf_url.replace("scores", "missing")
+			with self.assertRaises(RenderError):
+				renderer.render("{ c d e }")
+
+
+if __name__ == "__main__":
+	unittest.main()
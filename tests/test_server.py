@@ -0,0 +1,102 @@
+import asyncio
+import base64
+import contextlib
+import http.client
+import io
+import json
+import threading
+import unittest
+import unittest.mock
+
+from generate.idioms.score import Score
+from generate.midi_export import readMIDIFile
+from generate.server import GenerationServer, parse_piece_options, parse_time_sig
+
+class ServerMethods(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.loop = asyncio.new_event_loop()
+		cls.loop_thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+		cls.loop_thread.start()
+		cls.server = GenerationServer(port=0, workers=1, max_queued=1)
+		asyncio.run_coroutine_threadsafe(cls.server.start(), cls.loop).result()
+
+	@classmethod
+	def tearDownClass(cls):
+		asyncio.run_coroutine_threadsafe(cls.server.close(), cls.loop).result()
+		cls.loop.call_soon_threadsafe(cls.loop.stop)
+		cls.loop_thread.join()
+		cls.loop.close()
+
+	def get(self, request_path):
+		connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=60)
+		try:
+			connection.request("GET", request_path)
+			response = connection.getresponse()
+			return response.status, response.getheader("Content-Type"), response.read()
+		finally:
+			connection.close()
+
+	def test_time_sigs(self):
+		self.assertEqual(parse_time_sig("4/4"), (4, 2))
+		self.assertEqual(parse_time_sig("3/4"), (3, 2))
+		self.assertEqual(parse_time_sig("6/8"), (2, 3))
+		self.assertEqual(parse_time_sig("12/8"), (4, 3))
+
+	def test_option_check(self):
+		score_settings = (Score.tonic, Score.mode, Score.time_sig, Score.form)
+		with contextlib.redirect_stdout(io.StringIO()) as output:
+			piece_options = parse_piece_options("mode=minor&time_sig=6/8&form=ABA")
+		self.assertEqual(piece_options, {"mode": "minor", "time_sig": (2, 3), "form": "ABA"})
+		# checking a request leaves the score of the server alone
+		self.assertEqual((Score.tonic, Score.mode, Score.time_sig, Score.form), score_settings)
+		self.assertEqual(output.getvalue(), "")
+
+	def test_piece(self):
+		status, content_type, body = self.get("/piece?tonic=D&mode=major&seed=1&time_sig=4/4")
+		self.assertEqual(status, 200)
+		self.assertEqual(content_type, "application/json")
+		piece_fields = json.loads(body)
+		self.assertEqual(piece_fields["tonic"], "D")
+		self.assertEqual(piece_fields["time_sig"], [4, 2])
+		self.assertIn("Medley in D major", piece_fields["lily_text"])
+
+		midi_data = base64.b64decode(piece_fields["midi"])
+		self.assertEqual(len(readMIDIFile(midi_data).tracks), 6)
+		status, content_type, body = self.get("/piece.mid?tonic=D&mode=major&seed=1&time_sig=4/4")
+		self.assertEqual((status, content_type, body), (200, "audio/midi", midi_data))
+
+	def test_bad_requests(self):
+		self.assertEqual(self.get("/piece?mode=locrian")[0], 400)
+		self.assertEqual(self.get("/piece?seed=one")[0], 400)
+		self.assertEqual(self.get("/piece?time_sig=5/4")[0], 400)
+		self.assertEqual(self.get("/piece?key=C")[0], 400)
+		self.assertEqual(self.get("/piece?form=AbA")[0], 400)
+		self.assertEqual(self.get("/song")[0], 404)
+
+	def test_generation_error(self):
+		async def fail_to_respond(request_path):
+			raise ValueError("Generation bug")
+
+		with unittest.mock.patch.object(self.server, "respond", fail_to_respond):
+			with self.assertLogs("generate.server", "ERROR"):
+				status, _, body = self.get("/piece")
+		self.assertEqual((status, body), (500, b"Generation failed."))
+
+	def test_queue_limit(self):
+		async def make_pieces():
+			piece_options = {"tonic": "D", "mode": "major", "seed": 1, "time_sig": (4, 2)}
+			return await asyncio.gather(
+				*(self.server.make_piece(piece_options) for _ in range(3)),
+				return_exceptions=True
+			)
+
+		pieces = asyncio.run_coroutine_threadsafe(make_pieces(), self.loop).result()
+		# one piece is generated, one waits and the last is refused
+		self.assertEqual(pieces[0], pieces[1])
+		self.assertEqual(pieces[2].status, 503)
+
+
+if __name__ == "__main__":
+	unittest.main()